@@ -5,6 +5,8 @@ from pecos import graphics
 from pecos import logger
 from pecos import utils
 from pecos import pv
+from pecos import pipeline
+from pecos import fleet
 
 __version__ = '0.1.7'
 
@@ -0,0 +1,287 @@
+"""
+The fleet module contains functions to run quality control analysis for
+several systems in a process pool and collect results for a dashboard.
+"""
+import pandas as pd
+import os
+import time
+import traceback
+import logging
+import multiprocessing
+try:
+    from multiprocessing import SimpleQueue
+except ImportError: # Python 2.7
+    from multiprocessing.queues import SimpleQueue
+import pecos.pipeline
+import pecos.metrics
+import pecos.io
+import pecos.graphics
+
+try:
+    import yaml
+except:
+    pass
+
+logger = logging.getLogger(__name__)
+
+def run_fleet(systems, analysis=None, results_directory=None, processes=None,
+              timeout=None, cache_dir=None):
+    """
+    Run quality control analysis for several systems.
+    Each system is analyzed in a separate process.  If the analysis fails
+    for one system, the error is stored in the results and the remaining
+    systems are analyzed.
+
+    Parameters
+    ----------
+    systems : list of tuples
+        (system name, config, data) for each system, where
+
+        - system name (string or tuple) is used as the key in the results.
+          Use a tuple of (row name, column name) to create a dashboard with
+          io.write_dashboard.
+        - config (dictionary or string) is the system configuration, or a
+          configuration file name (yml format)
+        - data (pandas DataFrame, string or function) is the data, a data file
+          name (read using io.read_data_file), or a function that returns a 
+          DataFrame.  Functions must be defined at the top level of a module.
+
+    analysis : function (optional)
+        Function used to analyze each system, called using
+        analysis(system_name, config, df, results_directory), which returns
+        a dictionary of results, default = run_analysis.
+        The function must be defined at the top level of a module.
+
+    results_directory : string (optional)
+        Results directory, results for each system are saved to a
+        subdirectory, default = None (no files are written)
+
+    processes : int (optional)
+        Number of processes used to analyze systems, default = None
+        (number of CPUs).  If processes = 1, systems are analyzed in
+        the current process.
+
+    timeout : float (optional)
+        Maximum run time (in seconds) for each system, default = None (no 
+        limit).  The analysis of a system that runs longer than timeout, 
+        or whose process exits without returning results, fails with a 
+        timeout error.  Not used if processes = 1.
+
+    cache_dir : string (optional)
+        Cache directory used to read data files (see io.read_cached), 
+        default = None (data files are not cached)
+
+    Returns
+    -------
+    Dictionary of results for each system.  Each value is a dictionary
+    returned by the analysis function, with the additional keys 'status'
+    ('Success' or 'Failed'), 'run time' (seconds), and 'error' (traceback
+    if the analysis failed).
+    """
+    logger.info("Run fleet analysis")
+
+    if analysis is None:
+        analysis = run_analysis
+
+    args = [(system_name, config, data, analysis, results_directory, cache_dir)
+            for system_name, config, data in systems]
+
+    if processes == 1:
+        results = [_run_system(arg) for arg in args]
+    else:
+        # Worker processes report when each system starts, so the run time 
+        # of each system can be limited.  SimpleQueue writes to the pipe 
+        # immediately, so the start is reported if the process exits.
+        started = SimpleQueue()
+        pool = multiprocessing.Pool(processes, initializer=_init_process,
+                                    initargs=(started,))
+        timed_out = False
+        try:
+            tasks = [pool.apply_async(_run_started_system, ((i, arg),))
+                     for i, arg in enumerate(args)]
+            results, timed_out = _collect_results(tasks, args, started, 
+                                                  timeout)
+        finally:
+            # Processes that are still running a system are stopped
+            if timed_out:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+
+    return dict(results)
+
+def run_analysis(system_name, config, df, results_directory=None):
+    """
+    Run quality control analysis for a single system using a configuration
+    dictionary (see pipeline.compile_config for configuration options) 
+    and compute the quality control index (see pipeline.qci).
+
+    Parameters
+    ----------
+    system_name : string or tuple
+        System name
+
+    config : dictionary
+        System configuration
+
+    df : pandas DataFrame
+        Data
+
+    results_directory : string (optional)
+        Directory where test results, graphics, and the monitoring report
+        are saved, default = None (no files are written)
+
+    Returns
+    -------
+    Dictionary with keys 'metrics' (quality control index), 'test results',
+    'graphics' (list of file names), and 'report' (file name or None)
+    """
+    pm = pecos.pipeline.run_pipeline(config, df, threads=1)
+
+    QCI = pecos.pipeline.qci(pm, config)
+
+    results = {'metrics': QCI, 'test results': pm.test_results,
+               'graphics': [], 'report': None}
+
+    if results_directory is not None:
+        if not os.path.exists(results_directory):
+            os.makedirs(results_directory)
+        label = _system_label(system_name)
+        graphics_file_rootname = os.path.join(results_directory, 'test_results')
+        test_results_file = os.path.join(results_directory, label + '_test_results.csv')
+        report_file = os.path.join(results_directory, label + '.html')
+
+        graphics = pecos.graphics.plot_test_results(graphics_file_rootname, pm)
+        pecos.io.write_test_results(test_results_file, pm.test_results)
+        pecos.io.write_monitoring_report(report_file, pm, graphics, [], QCI, 
+                                        config=config)
+
+        results['graphics'] = graphics
+        results['report'] = os.path.abspath(report_file)
+
+    return results
+
+def dashboard_content(results):
+    """
+    Convert fleet results to dashboard content, which can be passed to
+    io.write_dashboard.  Each cell includes the run time (or error),
+    the metrics table, graphics, and a link to the monitoring report.
+
+    Parameters
+    ----------
+    results : dictionary
+        Fleet results, returned from run_fleet
+
+    Returns
+    -------
+    Dictionary of dashboard content
+    """
+    content = {}
+    for system_name, result in results.items():
+        if result['status'] == 'Success':
+            text = 'Run time: ' + str(round(result['run time'], 2)) + ' s'
+        else:
+            text = 'Analysis failed: ' + result['error'].strip().split('\n')[-1]
+        cell = {'text': text}
+
+        metrics = result.get('metrics')
+        if isinstance(metrics, (pd.DataFrame, pd.Series)):
+            cell['table'] = metrics.transpose().to_html(bold_rows=False, header=False)
+        if result.get('graphics'):
+            cell['graphics'] = result['graphics']
+        if result.get('report'):
+            cell['link'] = {'Link to Report': result['report']}
+        content[system_name] = cell
+
+    return content
+
+def _system_label(system_name):
+    if isinstance(system_name, tuple):
+        return '_'.join([str(name) for name in system_name])
+    return str(system_name)
+
+# Queue used by worker processes to report the system that is started
+_started = None
+
+def _init_process(started):
+    global _started
+    pecos.graphics._use_agg_backend()
+    _started = started
+
+def _collect_results(tasks, args, started, timeout, delay=0.05):
+    """
+    Wait for the result of each task.  Systems that run longer than timeout 
+    (after the worker process reports the start) fail with a timeout error.  
+    Returns the results and True if any system timed out.
+    """
+    results = [None]*len(tasks)
+    start_times = {}
+    timed_out = False
+    while True:
+        while not started.empty():
+            start_times[started.get()] = time.time()
+        for i, task in enumerate(tasks):
+            if results[i] is not None:
+                continue
+            if task.ready():
+                try:
+                    results[i] = task.get()
+                except Exception: # i.e. results can't be pickled
+                    results[i] = (args[i][0], {'status': 'Failed', 
+                        'error': traceback.format_exc(), 
+                        'run time': time.time() - start_times.get(i, time.time())})
+            elif timeout is not None and i in start_times and \
+                    time.time() - start_times[i] > timeout:
+                system_name = args[i][0]
+                logger.warning("Analysis timed out for " + 
+                               _system_label(system_name))
+                results[i] = (system_name, {'status': 'Failed', 
+                    'error': 'Analysis timed out after ' + str(timeout) + ' s',
+                    'run time': time.time() - start_times[i]})
+                timed_out = True
+        if all(result is not None for result in results):
+            break
+        time.sleep(delay)
+    
+    return results, timed_out
+
+def _run_started_system(args):
+    i, args = args
+    _started.put(i)
+    return _run_system(args)
+
+def _run_system(args):
+    system_name, config, data, analysis, results_directory, cache_dir = args
+    logger.info("Run analysis for " + _system_label(system_name))
+
+    start_time = time.time()
+    try:
+        if isinstance(config, str):
+            with open(config, 'r') as fid:
+                config = yaml.safe_load(fid)
+
+        if isinstance(data, str):
+            if cache_dir is None:
+                df = pecos.io.read_data_file(data)
+            else:
+                df = pecos.io.read_cached(data, reader=pecos.io.read_data_file, 
+                                          cache_dir=cache_dir)
+        elif callable(data):
+            df = data()
+        else:
+            df = data
+
+        if results_directory is not None:
+            results_directory = os.path.join(results_directory,
+                                             _system_label(system_name))
+
+        results = analysis(system_name, config, df, results_directory)
+        results['status'] = 'Success'
+        results['error'] = None
+    except Exception:
+        logger.warning("Analysis failed for " + _system_label(system_name))
+        results = {'status': 'Failed', 'error': traceback.format_exc()}
+    results['run time'] = time.time() - start_time
+
+    return system_name, results
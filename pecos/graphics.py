@@ -12,6 +12,8 @@ except:
 import textwrap
 import os
 import logging
+import multiprocessing
+import pecos.utils
 
 try:
     from nose.tools import nottest as _nottest
@@ -97,7 +99,7 @@ def plot_scatter(x,y,xaxis_min=None, xaxis_max=None, yaxis_min=None,
 
 def plot_timeseries(data, tfilter=None, test_results_group=None, xaxis_min=None, 
                     xaxis_max=None, yaxis_min=None, yaxis_max=None, title=None,
-                    figsize=(7.0, 3.0)):
+                    figsize=(7.0, 3.0), downsample=None):
     """
     Create a time series plot using each column in the DataFrame.
     
@@ -130,19 +132,34 @@ def plot_timeseries(data, tfilter=None, test_results_group=None, xaxis_min=None,
     
     figsize : tuple (optional)
         Figure size, default = (7.0, 3.0)
+    
+    downsample : int (optional)
+        Number of time intervals used to downsample data before plotting, 
+        default = None (not used).  The first, last, minimum and maximum 
+        data point in each interval is plotted (along with data points that 
+        failed a quality control test).  To keep the graphic visually 
+        lossless, use at least one interval per pixel.
     """
     
     plt.figure(figsize = figsize)
     ax = plt.gca()
     
     try:
+        # downsample data, data points that failed a test are kept
+        plot_data = data
+        if downsample is not None:
+            keep = _downsample_mask(data, downsample)
+            if test_results_group is not None and not test_results_group.empty:
+                keep = keep | _test_results_index_mask(data.index, test_results_group)
+            plot_data = data[keep]
+        
         # plot time series
         if isinstance(data, pd.Series):
-            data.plot(ax=ax, linewidth=1, grid=False, legend=False, color='k', 
-                      fontsize=8, rot=90, label='Data', x_compat=True)
+            plot_data.plot(ax=ax, linewidth=1, grid=False, legend=False, color='k', 
+                           fontsize=8, rot=90, label='Data', x_compat=True)
         else:
-            data.plot(ax=ax, linewidth=1, grid=False, legend=False, 
-                      fontsize=8, rot=90, label='Data')
+            plot_data.plot(ax=ax, linewidth=1, grid=False, legend=False, 
+                           fontsize=8, rot=90, label='Data')
     
         if tfilter is not None:
             # add tfilter        
@@ -181,12 +198,7 @@ def plot_timeseries(data, tfilter=None, test_results_group=None, xaxis_min=None,
                         str(test_results_group2.index.values).strip('[]'), 30))
                 error_label = error_label + '\n' + warning_label
                 
-                date_idx2 = np.array([False]*len(data.index))
-                for row2 in range(len(test_results_group2.index)):
-                    s_index = test_results_group2.columns.get_loc("Start Time")
-                    e_index = test_results_group2.columns.get_loc("End Time")
-                    date_idx2 = date_idx2 + ((data.index >= test_results_group2.iloc[row2,s_index]) & 
-                                             (data.index <= test_results_group2.iloc[row2,e_index]))
+                date_idx2 = _test_results_index_mask(data.index, test_results_group2)
                 
                 if sum(date_idx2) == 0:
                     continue
@@ -241,8 +253,74 @@ def plot_timeseries(data, tfilter=None, test_results_group=None, xaxis_min=None,
     box = ax.get_position()
     ax.set_position([box.x0, box.y0+0.15, box.width, box.height*0.75])
 
+def _test_results_index_mask(index, test_results):
+    """
+    Return a boolean array, True for each time in the index that is 
+    within the start and end time of a test result.  Start and end times are 
+    converted to integer positions and all intervals are flagged at once.
+    """
+    try:
+        if not index.is_monotonic_increasing:
+            raise ValueError("index must be monotonic")
+        start_time = pecos.utils.to_index_time(test_results['Start Time'], 
+                                               index)
+        end_time = pecos.utils.to_index_time(test_results['End Time'], index)
+    except (TypeError, ValueError):
+        date_idx = np.array([False]*len(index))
+        for start_date, end_date in zip(test_results['Start Time'], 
+                                        test_results['End Time']):
+            date_idx = date_idx + ((index >= start_date) & (index <= end_date))
+        return date_idx
+    
+    valid = ~(start_time.isnull() | end_time.isnull())
+    start = index.asi8.searchsorted(start_time.asi8[valid], side='left')
+    stop = index.asi8.searchsorted(end_time.asi8[valid], side='right')
+    
+    mask = pecos.utils.intervals_to_mask(start, stop, 
+                        np.zeros(len(start), dtype=int), (len(index), 1))
+    
+    return mask[:,0]
+
+def _downsample_mask(data, intervals):
+    """
+    Return a boolean array, True for data points that are kept when data is 
+    downsampled.  The time range is divided into equal intervals and the 
+    first, last, minimum and maximum data point in each interval (for each 
+    column) is kept, along with the data points on either side of missing 
+    data.
+    """
+    index = data.index
+    n = len(index)
+    if n <= 4*intervals or not index.is_monotonic_increasing:
+        return np.ones(n, dtype=bool)
+    
+    values = np.asarray(data.values, dtype=float).reshape(n, -1)
+    time = index.asi8.astype(float)
+    interval = ((time - time[0])/(time[-1] - time[0])*intervals).astype(int)
+    interval = np.minimum(interval, intervals-1)
+    
+    starts = np.flatnonzero(np.r_[True, interval[1:] != interval[:-1]])
+    ends = np.r_[starts[1:]-1, n-1]
+    keep = np.zeros(n, dtype=bool)
+    keep[starts] = True
+    keep[ends] = True
+    
+    # position of each data point's interval in starts
+    position = np.cumsum(np.r_[True, interval[1:] != interval[:-1]]) - 1
+    with np.errstate(invalid='ignore'):
+        for j in range(values.shape[1]):
+            v = values[:,j]
+            keep = keep | (v == np.fmin.reduceat(v, starts)[position])
+            keep = keep | (v == np.fmax.reduceat(v, starts)[position])
+            missing = np.isnan(v)
+            edge = np.r_[False, missing[1:] != missing[:-1]]
+            keep = keep | edge | np.r_[edge[1:], False]
+    
+    return keep
+
 def plot_interactive_timeseries(data, xaxis_min=None, xaxis_max=None, yaxis_min=None, 
-                 yaxis_max=None, title=None, filename=None, auto_open=True):
+                 yaxis_max=None, title=None, filename=None, auto_open=True, 
+                 downsample=None):
     """
     Create a basic interactive time series graphic using plotly.  Many more 
     options are available, see https://plot.ly for more details.
@@ -272,8 +350,16 @@ def plot_interactive_timeseries(data, xaxis_min=None, xaxis_max=None, yaxis_min=
     
     auto_open : boolean (optional)
         Flag indicating if HTML graphic is opened, default = True
+    
+    downsample : int (optional)
+        Number of time intervals used to downsample data before plotting, 
+        default = None (not used).  The first, last, minimum and maximum 
+        data point in each interval is plotted.
     """
     
+    if downsample is not None:
+        data = data[_downsample_mask(data, downsample)]
+    
     layout = dict(hovermode = 'closest')
     layout = dict(title=title, hovermode = 'closest',
                   xaxis=dict(range=[xaxis_min,xaxis_max]),
@@ -406,7 +492,7 @@ def plot_doy_heatmap(data, cmap='nipy_spectral', vmin=None, vmax=None,
     
 @_nottest
 def plot_test_results(filename_root, pm, image_format='png', dpi=500, 
-                      figsize=(7.0, 3.0)):
+                      figsize=(7.0, 3.0), processes=1, downsample=None):
     """
     Create test results graphics which highlight data points that
     failed a quality control test.
@@ -431,6 +517,20 @@ def plot_test_results(filename_root, pm, image_format='png', dpi=500,
         
     figsize : tuple (optional)
         Figure size, default = (7.0, 3.0)
+    
+    processes : int or None (optional)
+        Number of processes used to create graphics, default = 1.  If 
+        processes is None, the number of CPUs is used.  Graphics are 
+        created in a process pool using the Agg backend.  Filenames are 
+        returned in the same order for any number of processes.
+    
+    downsample : int (optional)
+        Number of time intervals used to downsample data before plotting, 
+        default = None (not used), see plot_timeseries
+    
+    Returns
+    ----------
+    list of graphics filenames
     """
     
     filename_root = os.path.abspath(filename_root)
@@ -443,8 +543,8 @@ def plot_test_results(filename_root, pm, image_format='png', dpi=500,
 
     graphic = 0
     
-    pm.test_results.sort_values(list(pm.test_results.columns), inplace=True)
-    pm.test_results.index = np.arange(1, pm.test_results.shape[0]+1)
+    test_results = pm.test_results.sort_values(list(pm.test_results.columns))
+    test_results.index = np.arange(1, test_results.shape[0]+1)
     
     # Remove specific error flags
     remove_error_flags = ['Duplicate timestamp', 
@@ -452,26 +552,63 @@ def plot_test_results(filename_root, pm, image_format='png', dpi=500,
                           'Corrupt data', 
                           'Missing timestamp', 
                           'Nonmonotonic timestamp']
-    test_results = pm.test_results[-pm.test_results['Error Flag'].isin(remove_error_flags)]
+    test_results = test_results[-test_results['Error Flag'].isin(remove_error_flags)]
     grouped = test_results.groupby(['Variable Name'])
-
+    
+    graphics_args = []
     for col_name, test_results_group in grouped:
-        logger.info("Creating graphic for " + col_name)
-        
-        plot_timeseries(pm.df[col_name], pm.tfilter, 
-                        test_results_group=test_results_group, figsize = figsize)
-
-        ax = plt.gca()
-        box = ax.get_position()
-        ax.set_position([box.x0, box.y0, box.width*0.65, box.height])
-        plt.legend(loc='center left', bbox_to_anchor=(1, 0.5), fontsize=8)
-        plt.title(col_name, fontsize=8)
-        
         filename = filename_root + str(graphic) + '.' + image_format
         test_results_graphics.append(filename)
-        plt.savefig(filename, format=image_format, dpi=dpi)
-            
+        graphics_args.append((filename, col_name, pm.df[col_name], 
+                              test_results_group, image_format, dpi, figsize, 
+                              downsample))
         graphic = graphic + 1
-        plt.close()
+    
+    if processes == 1 or len(graphics_args) <= 1:
+        for args in graphics_args:
+            _plot_test_results_graphic(args, pm.tfilter)
+    else:
+        # The time filter is sent to each process once, instead of with 
+        # each graphic
+        pool = multiprocessing.Pool(processes, initializer=_init_process, 
+                                    initargs=(pm.tfilter,))
+        try:
+            pool.map(_plot_process_graphic, graphics_args)
+        finally:
+            pool.close()
+            pool.join()
 
     return test_results_graphics
+
+def _use_agg_backend():
+    if plt.get_backend().lower() != 'agg':
+        plt.switch_backend('Agg')
+
+# Time filter of the worker process, set by the pool initializer
+_process_tfilter = None
+
+def _init_process(tfilter):
+    global _process_tfilter
+    _use_agg_backend()
+    _process_tfilter = tfilter
+
+def _plot_process_graphic(args):
+    _plot_test_results_graphic(args, _process_tfilter)
+
+def _plot_test_results_graphic(args, tfilter):
+    filename, col_name, data, test_results_group, image_format, \
+        dpi, figsize, downsample = args
+    logger.info("Creating graphic for " + col_name)
+    
+    plot_timeseries(data, tfilter, 
+                    test_results_group=test_results_group, figsize = figsize, 
+                    downsample=downsample)
+
+    ax = plt.gca()
+    box = ax.get_position()
+    ax.set_position([box.x0, box.y0, box.width*0.65, box.height])
+    plt.legend(loc='center left', bbox_to_anchor=(1, 0.5), fontsize=8)
+    plt.title(col_name, fontsize=8)
+    
+    plt.savefig(filename, format=image_format, dpi=dpi)
+    plt.close()
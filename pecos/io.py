@@ -6,7 +6,15 @@ import pandas as pd
 import numpy as np
 import logging
 import os
-from os.path import abspath, dirname, join
+from os.path import abspath, dirname, join, isfile
+import glob
+import functools
+import multiprocessing
+import json
+import hashlib
+import shutil
+import time
+import socket
 import pecos.graphics
 import datetime
 from jinja2 import Environment, PackageLoader
@@ -32,9 +40,44 @@ logger = logging.getLogger(__name__)
 
 env = Environment(loader=PackageLoader('pecos', 'templates'))
 
-def read_campbell_scientific(file_name, index_col='TIMESTAMP', encoding=None):
+def read_campbell_scientific_header(file_name, encoding=None):
     """
-    Read Campbell Scientific CSV file.
+    Read the header of a Campbell Scientific CSV file (TOA5 format).
+    
+    Parameters
+    ----------
+    file_name : string
+        File name, with full path
+    
+    encoding : string (optional)
+        Character encoding (i.e. utf-16)
+    
+    Returns
+    ---------
+    dictionary with the file environment ('environment'), column names 
+    ('columns'), units ('units') and processing types ('processing'), each 
+    stored as a list of strings
+    """
+    environment = pd.read_csv(file_name, header=None, nrows=1, dtype='unicode', 
+                              keep_default_na=False, encoding=encoding)
+    environment = list(environment.iloc[0])
+    while len(environment) > 0 and environment[-1] == '':
+        environment.pop()
+    
+    header = pd.read_csv(file_name, header=None, skiprows=1, nrows=3, 
+                         dtype='unicode', keep_default_na=False, 
+                         encoding=encoding)
+    
+    return {'environment': environment, 
+            'columns': list(header.iloc[0]), 
+            'units': list(header.iloc[1]), 
+            'processing': list(header.iloc[2])}
+
+def read_campbell_scientific(file_name, index_col='TIMESTAMP', encoding=None, 
+                             dtype='float64', chunksize=None):
+    """
+    Read Campbell Scientific CSV file.  Column names are read from the file 
+    header and data columns are read directly into the specified data type.
 
     Parameters
     ----------
@@ -47,32 +90,363 @@ def read_campbell_scientific(file_name, index_col='TIMESTAMP', encoding=None):
     encoding : string (optional)
         Character encoding (i.e. utf-16)
     
+    dtype : string or numpy dtype (optional)
+        Data type of the data columns (i.e. float32), default = 'float64'
+    
+    chunksize : int (optional)
+        Number of rows in each chunk.  If specified, an iterator over 
+        DataFrames is returned.
+    
     Returns
     ---------
-    pandas DataFrame with data
+    pandas DataFrame with data (or an iterator over pandas DataFrames if 
+    chunksize is specified)
     """
     logger.info("Reading Campbell Scientific CSV file " + file_name)
 
     try:
-        df = pd.read_csv(file_name, skiprows=1, encoding=encoding, index_col=index_col, parse_dates=True, dtype ='unicode', error_bad_lines=False) #, low_memory=False)
-        df = df[2:]
-        index = pd.to_datetime(df.index)
-        Unnamed = df.filter(regex='Unnamed')
-        df = df.drop(Unnamed.columns, 1)
-        df = pd.DataFrame(data = df.values, index = index, columns = df.columns, dtype='float64')
+        header = read_campbell_scientific_header(file_name, encoding)
+        # Columns without a name (trailing commas) are not read
+        columns = [col for col in header['columns'] if col != '']
+        dtypes = dict((col, dtype) for col in columns if col != index_col)
+        reader = pd.read_csv(file_name, skiprows=[0,2,3], header=0, 
+                             usecols=columns, index_col=index_col, 
+                             encoding=encoding, dtype=dtypes, 
+                             na_values=['NAN'], chunksize=chunksize, 
+                             error_bad_lines=False)
+        if chunksize is None:
+            df = _format_campbell_scientific(reader)
     except:
         logger.warning("Cannot extract database, CSV file reader failed " + file_name)
         df = pd.DataFrame()
         return
+    
+    if chunksize is not None:
+        return _read_campbell_scientific_chunks(reader, file_name)
+    
+    return df
 
-    # Drop rows with NaT (not a time) in the index
+def read_campbell_scientific_files(file_names, start_date=None, end_date=None, 
+                                   index_col='TIMESTAMP', encoding=None, 
+                                   dtype='float64', processes=None):
+    """
+    Read multiple Campbell Scientific CSV files, in parallel.  Data from all 
+    files is concatenated into a single DataFrame, sorted by index.  If a 
+    timestamp is found more than once, data is combined using the first 
+    non-null value in each column (files are ordered by file name).
+
+    Parameters
+    ----------
+    file_names : string or list of strings
+        Glob pattern (i.e. 'data/MET_*.dat') or list of file names. If 
+        start_date and end_date are specified, file_names is a file name 
+        template that is formatted using strftime for each day in the date 
+        range (i.e. 'data/MET_%Y_%m_%d.dat')
+
+    start_date : string or datetime (optional)
+        First day in the date range
+    
+    end_date : string or datetime (optional)
+        Last day in the date range
+    
+    index_col : string (optional)
+        Index column name, default = 'TIMESTAMP'
+
+    encoding : string (optional)
+        Character encoding (i.e. utf-16)
+    
+    dtype : string or numpy dtype (optional)
+        Data type of the data columns (i.e. float32), default = 'float64'
+    
+    processes : int (optional)
+        Number of processes used to read files.  If not specified, the 
+        number of CPUs is used.  If processes = 1, files are read serially.
+    
+    Returns
+    ---------
+    pandas DataFrame with data
+    """
+    if start_date is not None and end_date is not None:
+        dates = pd.date_range(start_date, end_date, freq='D')
+        file_names = [date.strftime(file_names) for date in dates]
+        missing = [file_name for file_name in file_names if not isfile(file_name)]
+        for file_name in missing:
+            logger.warning("File not found " + file_name)
+        file_names = [file_name for file_name in file_names if isfile(file_name)]
+    elif isinstance(file_names, str):
+        file_names = sorted(glob.glob(file_names))
+    
+    if len(file_names) == 0:
+        logger.warning("No Campbell Scientific CSV files to read")
+        return pd.DataFrame()
+    
+    reader = functools.partial(read_campbell_scientific, index_col=index_col, 
+                               encoding=encoding, dtype=dtype)
+    if processes == 1 or len(file_names) == 1:
+        dfs = [reader(file_name) for file_name in file_names]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            dfs = pool.map(reader, file_names)
+        finally:
+            pool.close()
+            pool.join()
+    
+    dfs = [df for df in dfs if df is not None]
+    if len(dfs) == 0:
+        return pd.DataFrame()
+    
+    # Files from different loggers can have different columns
+    df = _concat(dfs)
+    if not (df.index.is_monotonic_increasing and df.index.is_unique):
+        df = df.groupby(level=0).first()
+    
+    return df
+
+def _concat(dfs):
+    # Concatenate DataFrames by row, using the union of columns
+    columns = dfs[0].columns
+    for df in dfs[1:]:
+        if not df.columns.equals(columns):
+            columns = columns.union(df.columns)
+    if not all(df.columns.equals(columns) for df in dfs):
+        dfs = [df.reindex(columns=columns) for df in dfs]
+    
+    return pd.concat(dfs)
+
+def _read_campbell_scientific_chunks(reader, file_name):
     try:
-        df.drop(pd.NaT, inplace=True)
+        for chunk in reader:
+            yield _format_campbell_scientific(chunk)
     except:
-        pass
+        logger.warning("Cannot extract database, CSV file reader failed " + file_name)
 
+def _format_campbell_scientific(df):
+    # Convert the index to datetime, the datetime format is inferred from 
+    # the first timestamp
+    df.index = pd.to_datetime(df.index, infer_datetime_format=True)
+    
+    # Drop rows with NaT (not a time) in the index
+    if df.index.hasnans:
+        df = df[df.index.notnull()]
+    
+    return df
+    
+def read_data_file(file_name):
+    """
+    Read a data file, the reader is selected using the file extension: 
+    read_campbell_scientific (.dat files), pandas.read_excel (.xls and .xlsx 
+    files) or pandas.read_csv (other files).  The first column of Excel and 
+    csv files is the index.
+    
+    Parameters
+    ----------
+    file_name : string
+        File name, with full path
+    
+    Returns
+    ---------
+    pandas DataFrame with data
+    """
+    if not isfile(file_name):
+        raise IOError("Data file not found: " + file_name)
+    
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.dat':
+        df = read_campbell_scientific(file_name)
+    elif extension in ['.xls', '.xlsx']:
+        df = pd.read_excel(file_name, index_col=0)
+    else:
+        df = pd.read_csv(file_name, index_col=0, parse_dates=True)
     return df
+
+def read_cached(file_name, reader=None, cache_dir=None, mmap_mode='c', **kwds):
+    """
+    Read a data file using a cache.  The DataFrame returned by the reader is 
+    stored in a column store (see write_column_store), keyed by the file 
+    name, modification time and size.  If the file has not changed since the 
+    cache was written, data is loaded from the cache (memory-mapped) 
+    instead of parsing the file.  DataFrames with object (i.e. string) 
+    columns are not cached.
+
+    Parameters
+    ----------
+    file_name : string
+        File name, with full path
+    
+    reader : function (optional)
+        Function used to read the file, called using reader(file_name, **kwds), 
+        default = read_campbell_scientific
+    
+    cache_dir : string (optional)
+        Cache directory, default = '.pecos_cache' in the directory of the file
+    
+    mmap_mode : string or None (optional)
+        Memory-map mode used to load data from the cache (see numpy.load), 
+        default = 'c' (copy-on-write, changes are not written to the cache)
+    
+    kwds : keyword arguments (optional)
+        Keyword arguments passed to the reader
+    
+    Returns
+    ---------
+    pandas DataFrame with data
+    """
+    if reader is None:
+        reader = read_campbell_scientific
+    if cache_dir is None:
+        cache_dir = join(dirname(abspath(file_name)), '.pecos_cache')
+    
+    # Each file (and reader) is cached in a separate directory
+    source = {'file_name': abspath(file_name),
+              'reader': reader.__module__ + '.' + reader.__name__,
+              'kwds': repr(sorted(kwds.items()))}
+    key = hashlib.sha1(json.dumps(source, sort_keys=True).encode('utf-8'))
+    directory = join(cache_dir, os.path.basename(file_name) + '-' + key.hexdigest()[0:16])
+    source['mtime'] = os.path.getmtime(file_name)
+    source['size'] = os.path.getsize(file_name)
+    
+    try:
+        with open(join(directory, 'metadata.json'), 'r') as f:
+            metadata = json.load(f)
+        if metadata.get('source') == source:
+            logger.info("Reading cached file " + file_name)
+            return read_column_store(directory, mmap_mode)
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+    
+    df = reader(file_name, **kwds)
+    if df is None:
+        return df
+    
+    try:
+        write_column_store(df, directory, {'source': source})
+    except (IOError, OSError, TypeError, ValueError) as e:
+        logger.info("Cannot cache file " + file_name + ": " + str(e))
     
+    return df
+
+def write_column_store(df, directory, metadata=None):
+    """
+    Write a DataFrame to a column store, a directory that contains one .npy 
+    file for each data type in the DataFrame (columns are stored 
+    contiguously), the index (index.npy) and metadata (metadata.json, 
+    including the index name, time zone and frequency).
+    Existing data in the directory is replaced.  The index must be a 
+    DatetimeIndex or a numeric index and columns must have a numeric, 
+    boolean or datetime data type.
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        Data
+    
+    directory : string
+        Column store directory
+    
+    metadata : dictionary (optional)
+        Additional metadata, stored in metadata.json
+    """
+    if isinstance(df.index, pd.DatetimeIndex):
+        index = df.index.asi8
+        index_tz = None if df.index.tz is None else str(df.index.tz)
+        index_freq = df.index.freqstr
+    elif df.index.dtype.kind in 'biuf':
+        index = np.asarray(df.index)
+        index_tz = None
+        index_freq = None
+    else:
+        raise TypeError("Index type is not supported")
+    
+    columns = list(df.columns)
+    if json.loads(json.dumps(columns)) != columns:
+        raise TypeError("Column names are not supported")
+    
+    blocks = []
+    dtypes = df.dtypes
+    for dtype in pd.unique(dtypes.values):
+        if not isinstance(dtype, np.dtype) or dtype.kind not in 'biufcmM':
+            raise TypeError("Data type is not supported: " + str(dtype))
+        positions = [i for i in range(len(dtypes)) if dtypes.iloc[i] == dtype]
+        blocks.append({'file': 'block' + str(len(blocks)) + '.npy',
+                       'dtype': dtype.str, 
+                       'positions': positions})
+    
+    temp = directory + '.tmp' + str(os.getpid())
+    if os.path.exists(temp):
+        shutil.rmtree(temp)
+    os.makedirs(temp)
+    
+    np.save(join(temp, 'index.npy'), index)
+    for block in blocks:
+        # Columns are stored as rows of a 2D array (ncols x nrows)
+        values = np.ascontiguousarray(df.iloc[:, block['positions']].values.T)
+        np.save(join(temp, block['file']), values)
+    
+    column_store = {'columns': columns, 
+                    'index_name': df.index.name,
+                    'index_type': 'datetime' if isinstance(df.index, pd.DatetimeIndex) else 'numeric', 
+                    'index_tz': index_tz,
+                    'index_freq': index_freq,
+                    'blocks': blocks}
+    if metadata is not None:
+        column_store.update(metadata)
+    with open(join(temp, 'metadata.json'), 'w') as f:
+        json.dump(column_store, f)
+    
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.rename(temp, directory)
+
+def read_column_store(directory, mmap_mode='c'):
+    """
+    Read a DataFrame from a column store (see write_column_store).  If the 
+    DataFrame has a single data type, the DataFrame uses the memory-mapped 
+    data without a copy.
+
+    Parameters
+    ----------
+    directory : string
+        Column store directory
+    
+    mmap_mode : string or None (optional)
+        Memory-map mode (see numpy.load), default = 'c' (copy-on-write)
+    
+    Returns
+    ---------
+    pandas DataFrame with data
+    """
+    with open(join(directory, 'metadata.json'), 'r') as f:
+        metadata = json.load(f)
+    
+    index = np.load(join(directory, 'index.npy'))
+    if metadata['index_type'] == 'datetime':
+        index = pd.DatetimeIndex(index.astype('datetime64[ns]'), 
+                                 name=metadata['index_name'])
+        if metadata['index_tz'] is not None:
+            index = index.tz_localize('UTC').tz_convert(metadata['index_tz'])
+        if metadata.get('index_freq') is not None:
+            index = pd.DatetimeIndex(index, freq=metadata['index_freq'])
+    else:
+        index = pd.Index(index, name=metadata['index_name'])
+    
+    columns = metadata['columns']
+    if len(metadata['blocks']) == 0:
+        return pd.DataFrame(index=index, columns=columns)
+    
+    dfs = []
+    for block in metadata['blocks']:
+        values = np.load(join(directory, block['file']), mmap_mode=mmap_mode)
+        block_columns = [columns[i] for i in block['positions']]
+        dfs.append(pd.DataFrame(values.T, index=index, columns=block_columns))
+    
+    if len(dfs) == 1:
+        return dfs[0]
+    
+    df = pd.concat(dfs, axis=1)
+    
+    return df[columns]
+
 def send_email(subject, body, recipient, sender, attachment=None, 
                host='localhost', username=None, password=None):
     """
@@ -143,9 +517,9 @@ def _create_email_message(subject, body, recipient, sender):
     
     return msg
         
-def write_metrics(filename, metrics):
+def write_metrics(filename, metrics, timeout=60):
     """
-    Write metrics file.
+    Write metrics file.  The file is locked while metrics are written.
     
     Parameters
     -----------
@@ -154,20 +528,252 @@ def write_metrics(filename, metrics):
     
     metrics : pandas DataFrame
         Data to add to the metrics file
+    
+    timeout : float (optional)
+        Maximum time (in seconds) to wait for the file lock, default = 60
     """
     logger.info("Write metrics file")
+    
+    with _FileLock(filename + '.lock', timeout):
+        _upsert_metrics(filename, metrics)
+
+def write_metrics_store(directory, metrics, partition='month', timeout=60):
+    """
+    Write metrics to a metrics store.  The metrics store is a directory of 
+    metrics files (metrics_YYYY-MM.csv or metrics_YYYY.csv), partitioned by 
+    month or year.  New metrics are added to the store and existing metrics 
+    with the same TIMESTEP and column are updated.  Only the partitions that 
+    contain new metrics are rewritten.  The store is locked while metrics are 
+    written.
+    
+    Parameters
+    -----------
+    directory : string
+        Metrics store directory, with full path
+    
+    metrics : pandas DataFrame
+        Data to add to the metrics store, indexed by time
+    
+    partition : string (optional)
+        Partition size, 'month' or 'year', default = 'month'
+    
+    timeout : float (optional)
+        Maximum time (in seconds) to wait for the store lock, default = 60
+    """
+    logger.info("Write metrics store")
+    
+    if partition not in _partition_formats:
+        raise ValueError("partition must be 'month' or 'year'")
+    if metrics.shape[0] == 0:
+        return
+    
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    
+    keys = np.asarray(pd.DatetimeIndex(metrics.index).strftime(_partition_formats[partition]))
+    with _FileLock(join(directory, 'metrics.lock'), timeout):
+        for key in np.unique(keys):
+            filename = join(directory, 'metrics_' + key + '.csv')
+            _upsert_metrics(filename, metrics[keys == key])
+
+def read_metrics_store(directory, start_date=None, end_date=None):
+    """
+    Read metrics from a metrics store (see write_metrics_store).  Only 
+    partitions in the date range are read.  Timestamps that include a UTC 
+    offset are returned in UTC, and start_date and end_date without a time 
+    zone are then assumed to be in UTC.
+    
+    Parameters
+    -----------
+    directory : string
+        Metrics store directory, with full path
+    
+    start_date : string or datetime (optional)
+        Start of the date range
+    
+    end_date : string or datetime (optional)
+        End of the date range
+    
+    Returns
+    ---------
+    pandas DataFrame with metrics
+    """
+    # Dates are compared to the partitions as UTC times without a time zone
+    if start_date is not None:
+        start_date = _utc_timestamp(start_date)
+    if end_date is not None:
+        end_date = _utc_timestamp(end_date)
+    
+    # Partitions are selected with one day of padding to account for 
+    # UTC offsets
+    dfs = []
+    for filename in sorted(glob.glob(join(directory, 'metrics_*.csv'))):
+        key = os.path.basename(filename)[len('metrics_'):-len('.csv')]
+        if len(key) == 4:
+            period = pd.Period(key, freq='A')
+        else:
+            period = pd.Period(key, freq='M')
+        if start_date is not None and \
+                period.end_time + pd.Timedelta(days=1) < start_date:
+            continue
+        if end_date is not None and \
+                period.start_time - pd.Timedelta(days=1) > end_date:
+            continue
+        df = pd.read_csv(filename, index_col='TIMESTEP', parse_dates=True)
+        if isinstance(df.index, pd.DatetimeIndex):
+            if df.index.tz is not None:
+                df.index = df.index.tz_convert('UTC')
+        elif df.shape[0] > 0: # mix of UTC offsets
+            df.index = pd.to_datetime(df.index, utc=True)
+        dfs.append(df)
+    
+    if len(dfs) == 0:
+        return pd.DataFrame()
+    
+    df = _concat(dfs).sort_index()
+    if getattr(df.index, 'tz', None) is not None:
+        if start_date is not None:
+            start_date = start_date.tz_localize('UTC')
+        if end_date is not None:
+            end_date = end_date.tz_localize('UTC')
+    if start_date is not None:
+        df = df[df.index >= start_date]
+    if end_date is not None:
+        df = df[df.index <= end_date]
+    
+    return df
+
+def _utc_timestamp(date):
+    date = pd.Timestamp(date)
+    if date.tz is not None:
+        date = date.tz_convert('UTC').tz_localize(None)
+    return date
+
+_partition_formats = {'month': '%Y-%m', 'year': '%Y'}
 
+def _upsert_metrics(filename, metrics):
     try:
         previous_metrics = pd.read_csv(filename, index_col='TIMESTEP') #, parse_dates=True)
     except:
         previous_metrics = pd.DataFrame()
-        
+    
+    metrics = metrics.copy()
     metrics.index = metrics.index.to_native_types() # this is necessary when using time zones
     metrics = metrics.combine_first(previous_metrics) 
     
-    fout = open(filename, 'w')
+    # Write to a temporary file and replace the metrics file, so the 
+    # metrics file is not corrupted if writing fails
+    temp = filename + '.tmp' + str(os.getpid())
+    fout = open(temp, 'w')
     metrics.to_csv(fout, index_label='TIMESTEP', na_rep = 'NaN')
     fout.close()
+    _replace(temp, filename)
+
+def _replace(src, dst):
+    try:
+        os.replace(src, dst)
+    except AttributeError: # Python 2.7
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+class _FileLock(object):
+    """
+    Lock used to prevent concurrent writes.  The lock is an advisory lock 
+    (flock on Unix, msvcrt on Windows) on a lock file, which is released by 
+    the operating system if the owner process exits, so a process that 
+    crashed never leaves a stale lock.  The lock file contains the host name 
+    and process id of the owner and is removed when the lock is released.
+    """
+    def __init__(self, filename, timeout=60, delay=0.05):
+        self.filename = filename
+        self.timeout = timeout
+        self.delay = delay
+        self._fd = None
+        
+    def __enter__(self):
+        start = time.time()
+        while True:
+            fd = os.open(self.filename, os.O_CREAT | os.O_RDWR)
+            # The lock file can be removed by the previous owner after it 
+            # was opened, the lock is only valid if the file still exists
+            if _lock_file(fd):
+                if self._is_lock_file(fd):
+                    os.ftruncate(fd, 0)
+                    os.write(fd, (socket.gethostname() + ' ' + str(os.getpid())).encode())
+                    self._fd = fd
+                    return self
+                _unlock_file(fd)
+            os.close(fd)
+            if time.time() - start > self.timeout:
+                raise RuntimeError("Cannot acquire lock " + self.filename + 
+                                   _lock_owner(self.filename))
+            time.sleep(self.delay)
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        fd = self._fd
+        self._fd = None
+        # Remove the lock file before it is unlocked (processes waiting on 
+        # the lock then open a new lock file), only if it is still ours
+        if self._is_lock_file(fd):
+            try:
+                os.remove(self.filename)
+            except OSError: # the lock file is open by another process (Windows)
+                pass
+        _unlock_file(fd)
+        os.close(fd)
+    
+    def _is_lock_file(self, fd):
+        """
+        Check if the open file fd is the lock file (by device and inode).
+        """
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return False
+        fstat = os.fstat(fd)
+        return (stat.st_dev, stat.st_ino) == (fstat.st_dev, fstat.st_ino)
+
+def _lock_owner(filename):
+    try:
+        with open(filename, 'r') as f:
+            owner = f.read().strip()
+    except (IOError, OSError):
+        return ''
+    if owner:
+        return ', held by ' + owner
+    return ''
+
+try:
+    import fcntl
+    
+    def _lock_file(fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            return False
+        return True
+    
+    def _unlock_file(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        
+except ImportError: # Windows
+    import msvcrt
+    
+    def _lock_file(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except (IOError, OSError):
+            return False
+        return True
+    
+    def _unlock_file(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
 
 @_nottest
 def write_test_results(filename, test_results):
@@ -183,7 +789,7 @@ def write_test_results(filename, test_results):
         Test results stored in pm.test_results
     """
 
-    test_results.sort_values(list(test_results.columns), inplace=True)
+    test_results = test_results.sort_values(list(test_results.columns))
     test_results.index = np.arange(1, test_results.shape[0]+1)
 
     logger.info("Writing test results csv file " + filename)
@@ -262,14 +868,13 @@ def write_monitoring_report(filename, pm, test_results_graphics=[], custom_graph
     except:
         notes_df = pd.DataFrame()
     
-    pm.test_results.sort_values(list(pm.test_results.columns), inplace=True)
-    pm.test_results.index = np.arange(1, pm.test_results.shape[0]+1)
-    #pm.test_results.reset_index(inplace=True)
+    test_results = pm.test_results.sort_values(list(pm.test_results.columns))
+    test_results.index = np.arange(1, test_results.shape[0]+1)
     
     # Convert to html format
     if metrics is None:
         metrics = pd.DataFrame()
-    test_results_html = pm.test_results.to_html(justify='left')
+    test_results_html = test_results.to_html(justify='left')
     metrics_html = metrics.to_html(justify='left')
     notes_html = notes_df.to_html(justify='left', header=False)
     
@@ -277,7 +882,7 @@ def write_monitoring_report(filename, pm, test_results_graphics=[], custom_graph
                 'end_time': str(end_time), 
                 'num_notes': str(notes_df.shape[0]),
                 'notes': notes_html, 
-                'num_test_results': str(pm.test_results.shape[0]),
+                'num_test_results': str(test_results.shape[0]),
                 'test_results': test_results_html,
                 'test_results_graphics': test_results_graphics,
                 'custom_graphics': custom_graphics,
@@ -3,12 +3,11 @@ The metrics module contains performance metrics to track system health.
 """
 import pandas as pd
 import numpy as np
-import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
-def qci(mask, tfilter=None, per_day=True):
+def qci(mask, tfilter=None, per_day=True, period=None, partial_sums=False):
     """
     Compute the quality control index (QCI), defined as:
     
@@ -31,6 +30,15 @@ def qci(mask, tfilter=None, per_day=True):
     per_day : boolean (optional)
         Flag indicating if the results should be computed per day, default = True
     
+    period : string (optional)
+        Pandas offset alias (i.e. '15min', 'H', 'D', 'W', 'MS') used to compute 
+        results per period, overrides per_day, default = None
+        
+    partial_sums : boolean (optional)
+        Flag indicating if the number of passing data points and the number 
+        of data points are returned instead of QCI, default = False.  
+        Partial sums can be aggregated to a longer period using rollup.
+        
     Returns
     -------
     pandas DataFrame with quality control index
@@ -41,26 +49,28 @@ def qci(mask, tfilter=None, per_day=True):
     if tfilter is not None:
         mask = mask[tfilter]
     
-    if per_day:     
-        dates = [mask.index[0].date() + datetime.timedelta(days=x) for x in range(0, (mask.index[-1].date()-mask.index[0].date()).days+1)]
+    period = _period(per_day, period)
+    
+    if period is not None:
+        passed = mask.sum(axis=1).resample(period).sum()
+        count = pd.Series(mask.shape[1], index=mask.index).resample(period).sum()
+        sums = pd.DataFrame({_qci_sums[0]: passed, _qci_sums[1]: count}, 
+                            columns=_qci_sums).fillna(0)
+    else:
+        sums = pd.DataFrame([[mask.sum().sum(), mask.shape[0]*mask.shape[1]]], 
+                            index=[0], columns=_qci_sums)
     
-        QCI = pd.DataFrame(index=pd.to_datetime(dates))
+    if partial_sums:
+        return sums
     
-        for date in dates:
-            mask_date = mask.loc[date.strftime('%m/%d/%Y')]
-            try:
-                QCIndex = mask_date.sum().sum()/float(mask_date.shape[0]*mask_date.shape[1])
-                if np.isnan(QCIndex):
-                    QCIndex = 0
-                QCI.loc[date, 'Quality Control Index'] = QCIndex
-            except:
-                QCI.loc[date, 'Quality Control Index'] = 0
+    if period is not None:
+        QCI = _qci_from_sums(sums)
     else:
         QCI = mask.sum().sum()/float(mask.shape[0]*mask.shape[1])
         
     return QCI   
 
-def rmse(x1, x2, tfilter=None, per_day=True):
+def rmse(x1, x2, tfilter=None, per_day=True, period=None, partial_sums=False):
     """
     Compute the root mean squared error (RMSE), defined as:
     
@@ -85,6 +95,15 @@ def rmse(x1, x2, tfilter=None, per_day=True):
     per_day : boolean (optional)
         Flag indicating if the results should be computed per day, default = True
     
+    period : string (optional)
+        Pandas offset alias (i.e. '15min', 'H', 'D', 'W', 'MS') used to compute 
+        results per period, overrides per_day, default = None
+        
+    partial_sums : boolean (optional)
+        Flag indicating if the sum of squared error and the number of data 
+        points are returned instead of RMSE, default = False.  
+        Partial sums can be aggregated to a longer period using rollup.
+        
     Returns
     -------
     pandas DataFrame with root mean squared error
@@ -99,26 +118,29 @@ def rmse(x1, x2, tfilter=None, per_day=True):
     if tfilter is not None:
         x1 = x1[tfilter]
         x2 = x2[tfilter]
-        
-    def compute_rmse(data1, data2):
-        val = np.sqrt(np.mean(np.power(data1 - data2,2)))
-        return val
-        
-    if per_day:
-        dates = [x1.index[0].date() + datetime.timedelta(days=x) for x in range(0, (x1.index[-1].date()-x1.index[0].date()).days+1)]
-        rmse = pd.DataFrame(index=pd.to_datetime(dates))
-        for date in dates:
-            x1_date1 = x1.loc[date.strftime('%m/%d/%Y')] 
-            x2_date2 = x2.loc[date.strftime('%m/%d/%Y')] 
-            val = compute_rmse(x1_date1, x2_date2)
-            rmse.loc[date, 'RMSE'] = val
+    
+    square_error = np.power(x1 - x2, 2)
+    
+    period = _period(per_day, period)
+    
+    if period is not None:
+        # Results are reported over the time range of x1
+        periods = x1.resample(period).count().index
+        sse = square_error.resample(period).sum().reindex(periods).fillna(0)
+        count = square_error.resample(period).count().reindex(periods).fillna(0)
+        sums = pd.DataFrame({_rmse_sums[0]: sse, _rmse_sums[1]: count}, 
+                            columns=_rmse_sums)
     else:
-        val = compute_rmse(x1, x2)
-        rmse = pd.DataFrame(val, index=[0], columns=['RMSE'])
-
-    return rmse
+        sums = pd.DataFrame([[square_error.sum(), square_error.count()]], 
+                            index=[0], columns=_rmse_sums)
     
-def time_integral(data, tfilter=None, per_day=True):
+    if partial_sums:
+        return sums
+    
+    return _rmse_from_sums(sums)
+    
+def time_integral(data, tfilter=None, per_day=True, period=None, 
+                  partial_sums=False):
     """
     Compute the time integral (F) of each column in the DataFrame, defined as:
     
@@ -127,9 +149,12 @@ def time_integral(data, tfilter=None, per_day=True):
     where 
     :math:`f` is a column of data 
     :math:`dt` is the time step between observations.
-    The time integral is computed using the trapezoidal rule from numpy.trapz.
+    The time integral is computed using the trapezoidal rule.
     Results are given in [original data units]*seconds.
     NaN values are set to 0 for integration.
+    When results are computed per period, the time step between the last 
+    observation in one period and the first observation in the next 
+    period is not included.
     
     Parameters
     -----------
@@ -142,6 +167,17 @@ def time_integral(data, tfilter=None, per_day=True):
     per_day : boolean (doptional)
         Flag indicating if the results should be computed per day, default = True
     
+    period : string (optional)
+        Pandas offset alias (i.e. '15min', 'H', 'D', 'W', 'MS') used to compute 
+        results per period, overrides per_day, default = None
+    
+    partial_sums : boolean (optional)
+        Flag indicating if the time integral between the last observation 
+        in the previous period and the first observation in each period, 
+        and the number of data points, are also returned, default = False.  
+        Partial sums can be aggregated to a longer period using rollup.  
+        Only used when results are computed per period.
+        
     Returns
     -------
     pandas DataFrame with time integral of the data, each column is named 
@@ -154,27 +190,258 @@ def time_integral(data, tfilter=None, per_day=True):
     
     data = data.fillna(0) # fill NaN with 0
     
-    def compute_integral(d):
-        val = {}
-        tdelta = ((d.index - d.index[0]).values)/1000000000 # convert ns to seconds
-        for col in d.columns:
-            val['Time integral of ' + col] = float(np.trapz(d.loc[:,col], tdelta))
-        return val
-        
-    if per_day:
-        dates = [data.index[0].date() + datetime.timedelta(days=x) for x in range(0, (data.index[-1].date()-data.index[0].date()).days+1)]
-        F = pd.DataFrame(index=pd.to_datetime(dates))
-        for date in dates:
-            df_date = data.loc[date.strftime('%m/%d/%Y')] 
-            df_int = compute_integral(df_date)
-            for col in df_int:
-                F.loc[date, col] = df_int[col]
+    columns = ['Time integral of ' + col for col in data.columns]
+    
+    period = _period(per_day, period)
+    
+    if period is not None:
+        terms = _trapezoid_terms(data, period)
+        terms.columns = columns
+        if partial_sums:
+            between = _trapezoid_terms(data).values - terms.values
+            for col, values in zip(data.columns, between.T):
+                terms[_between_periods + col] = values
+            terms[_count] = 1
+        F = terms.resample(period).sum().fillna(0)
     else:
-        F = compute_integral(data)
-        F = pd.DataFrame(F, index=[0])
+        F = _trapezoid_terms(data).sum().to_frame().T
+        F.columns = columns
     
     return F
 
+def rollup(partial_sums, period):
+    """
+    Aggregate metrics to a longer period (i.e. daily to monthly) without 
+    recomputing the metrics from data.
+    
+    Partial sums returned from qci or rmse (partial_sums=True) are summed 
+    over each period and used to compute QCI or RMSE.  Partial sums 
+    returned from time_integral (partial_sums=True) are summed over each 
+    period, including the time integral between shorter periods that are 
+    in the same period, which gives the same result as computing the time 
+    integral per period.  Other metrics are summed over each period.
+    
+    Parameters
+    ----------
+    partial_sums : pandas DataFrame
+        Partial sums or time integrals, indexed by the start of each period
+    
+    period : string
+        Pandas offset alias (i.e. 'D', 'W', 'MS', 'AS') used to aggregate 
+        results.  The period should be a multiple of the period used to 
+        compute partial_sums.
+        
+    Returns
+    -------
+    pandas DataFrame with metrics per period
+    """
+    if _count in partial_sums.columns and any(col.startswith(_between_periods) 
+                                             for col in partial_sums.columns):
+        return _time_integral_from_sums(partial_sums, period)
+    
+    sums = partial_sums.resample(period).sum().fillna(0)
+    
+    if list(partial_sums.columns) == _qci_sums:
+        return _qci_from_sums(sums)
+    elif list(partial_sums.columns) == _rmse_sums:
+        return _rmse_from_sums(sums)
+    else:
+        return sums
+
+_count = 'Number of data points'
+_qci_sums = ['Number of passing data points', _count]
+_rmse_sums = ['Sum of squared error', _count]
+_between_periods = 'Time integral from previous period of '
+
+def _period(per_day, period):
+    """
+    Return the pandas offset alias used to compute results per period, 
+    None if results are computed over the entire data set.
+    """
+    if period is None and per_day:
+        period = 'D'
+    return period
+
+def _period_groups(index, period):
+    """
+    Return the start of each period and the period number of each 
+    timestamp (after sorting the index).
+    """
+    size = pd.Series(1, index=index).resample(period).sum().fillna(0)
+    group = np.repeat(np.arange(len(size)), size.values.astype('int64'))
+    return size.index, group
+
+def _qci_from_sums(sums):
+    QCI = (sums[_qci_sums[0]]/sums[_qci_sums[1]].astype('float64')).fillna(0)
+    return QCI.to_frame('Quality Control Index')
+
+def _rmse_from_sums(sums):
+    RMSE = np.sqrt(sums[_rmse_sums[0]]/sums[_rmse_sums[1]].astype('float64'))
+    return RMSE.to_frame('RMSE')
+    
+def _time_integral_from_sums(partial_sums, period):
+    """
+    Aggregate time integral partial sums to a longer period.  The time 
+    integral between shorter periods is included, except before the first 
+    shorter period with data in each period (which is between periods).
+    """
+    between = [col for col in partial_sums.columns 
+               if col.startswith(_between_periods)]
+    columns = ['Time integral of ' + col[len(_between_periods):] 
+               for col in between]
+    
+    with_data = partial_sums[partial_sums[_count] > 0]
+    position = pd.Series(np.arange(with_data.shape[0]), index=with_data.index)
+    first = position.resample(period).min().dropna()
+    values = with_data[between].values.copy()
+    values[first.values.astype('int64')] = 0
+    between = pd.DataFrame(values, index=with_data.index, columns=columns)
+    
+    F = partial_sums[columns] + between.reindex(partial_sums.index).fillna(0)
+    
+    return F.resample(period).sum().fillna(0)
+
+def _trapezoid_terms(data, period=None):
+    """
+    Return the trapezoidal rule area (in [data units]*seconds) between each 
+    timestamp and the previous timestamp.  If a period is given, the area 
+    is 0 for the first timestamp in each period, so the sum over a period 
+    is the time integral of that period.
+    """
+    values = data.values.astype('float64')
+    terms = np.zeros(values.shape)
+    if values.shape[0] > 1:
+        dt = np.diff(data.index.asi8)/1e9 # convert ns to seconds
+        terms[1:] = dt[:,None]*(values[1:] + values[:-1])/2.0
+        if period is not None:
+            position = pd.Series(np.arange(values.shape[0]), index=data.index)
+            first = position.resample(period).min().dropna()
+            terms[first.values.astype('int64')] = 0
+    
+    return pd.DataFrame(terms, index=data.index, columns=data.columns)
+    
+def confusion_matrix(observed, actual, tfilter=None, per_column=False, 
+                     period=None):
+    """
+    Compute the number of true positives (TP), false positives (FP), 
+    true negatives (TN), and false negatives (FN), where 
+    
+    * TP = anomalous condition where tests fail
+    * FP = normal condition where tests fail
+    * TN = normal condition where tests pass
+    * FN = anomalous condition where tests pass
+    
+    Data points that are not True or False (i.e. NaN) are not counted.
+    
+    Parameters
+    ----------
+    observed : pandas DataFrame
+        Estimated conditions (True = background, False = anomolous), 
+        returned from pm.get_test_results_mask()
+    
+    actual : pandas DataFrame
+        Actual conditions, (True = background, False = anomolous)
+    
+    tfilter : pandas Series (optional)
+        Time filter containing boolean values for each time index
+        
+    per_column : boolean (optional)
+        Flag indicating if the results should be computed per column, 
+        default = False
+    
+    period : string (optional)
+        Pandas offset alias (i.e. 'H', 'D', 'MS') used to compute results 
+        per period, default = None
+        
+    Returns
+    -------
+    pandas DataFrame with columns TP, FP, TN, and FN.  The index is the column 
+    names (per_column=True), the start of each period (period is not None), 
+    both (as a MultiIndex), or [0].
+    """
+    if tfilter is not None:
+        observed = observed[tfilter]
+        actual = actual[tfilter]
+    
+    if isinstance(observed, pd.Series):
+        observed = observed.to_frame()
+        actual = actual.to_frame(observed.columns[0])
+    
+    if not (observed.index.equals(actual.index) and 
+            observed.columns.equals(actual.columns)):
+        raise ValueError('Can only compare identically-labeled DataFrame objects')
+    
+    # Condition code for each data point: 0 = TN, 1 = FN, 2 = FP, 3 = TP, 
+    # 4 = not counted
+    obs = observed.values
+    act = actual.values
+    obs_anomalous = (obs == False)
+    act_anomalous = (act == False)
+    code = 2*obs_anomalous.astype('int64') + act_anomalous
+    if not (obs.dtype == bool and act.dtype == bool):
+        valid = ((obs_anomalous | (obs == True)) & (act_anomalous | (act == True)))
+        code[~valid] = 4
+    
+    nrows, ncols = code.shape
+    
+    if period is not None:
+        if not observed.index.is_monotonic_increasing:
+            order = np.argsort(observed.index.values, kind='mergesort')
+            code = code[order]
+        periods, group = _period_groups(observed.index, period)
+    else:
+        periods, group = [0], np.zeros(nrows, dtype='int64')
+    
+    # Count codes per period and column in one pass
+    key = (group[:,None]*ncols + np.arange(ncols))*5 + code
+    counts = np.bincount(key.ravel(), minlength=len(periods)*ncols*5)
+    counts = counts.reshape(len(periods), ncols, 5)
+    
+    if not per_column:
+        counts = counts.sum(axis=1, keepdims=True)
+    counts = counts[:,:,[3,2,0,1]].reshape(-1, 4)
+    
+    if per_column and period is not None:
+        index = pd.MultiIndex.from_product([periods, observed.columns])
+    elif per_column:
+        index = observed.columns
+    else:
+        index = periods
+    
+    return pd.DataFrame(counts, index=index, columns=['TP', 'FP', 'TN', 'FN'])
+
+def confusion_matrix_metrics(counts):
+    """
+    Compute metrics from the confusion matrix, including:
+    
+    * Probability of detection, :math:`PD=\dfrac{TP}{TP+FN}`
+    * False alarm rate, :math:`FAR=\dfrac{FP}{TN+FP}`
+    * Precision, :math:`\dfrac{TP}{TP+FP}`
+    * F1 score, :math:`\dfrac{2TP}{2TP+FP+FN}`
+    * Accuracy, :math:`\dfrac{TP+TN}{TP+FP+TN+FN}`
+    
+    Parameters
+    ----------
+    counts : pandas DataFrame
+        Number of true positives (TP), false positives (FP), true negatives 
+        (TN), and false negatives (FN), returned from confusion_matrix()
+    
+    Returns
+    -------
+    pandas DataFrame with metrics, using the same index as counts
+    """
+    counts = counts.astype('float64')
+    TP, FP, TN, FN = counts['TP'], counts['FP'], counts['TN'], counts['FN']
+    
+    results = pd.DataFrame(index=counts.index)
+    results['Probability of Detection'] = TP/(TP+FN)
+    results['False Alarm Rate'] = FP/(TN+FP)
+    results['Precision'] = TP/(TP+FP)
+    results['F1 Score'] = 2*TP/(2*TP+FP+FN)
+    results['Accuracy'] = (TP+TN)/(TP+FP+TN+FN)
+    
+    return results
+    
 def probability_of_detection(observed, actual, tfilter=None):
     """ 
     Compute probability of detection (PD), defined as:
@@ -194,24 +461,16 @@ def probability_of_detection(observed, actual, tfilter=None):
     actual : pandas DataFrame
         Actual conditions, (True = background, False = anomolous)
    
+    tfilter : pandas Series (optional)
+        Time filter containing boolean values for each time index
+        
     Returns
     -------
     Probability of detection, float
     """
-    # Remove time filter
-    if tfilter is not None:
-        observed = observed[tfilter]
-        actual = actual[tfilter]
-
-    # True positive (TP) = anomolous condition where tests fail
-    # TP is 1 where the statement is true, Nan where the statement is false
-    TP = (observed.where(observed == False)+1) == (actual.where(actual == False)+1)
-    TP_count = TP.sum().sum()
-    
-    # False negative (FN) = anomolous condition where tests pass
-    # FN is 1 where the statement is true, Nan where the statement is false
-    FN = (observed.where(observed == True)) == (actual.where(actual == False)+1)
-    FN_count = FN.sum().sum()
+    counts = confusion_matrix(observed, actual, tfilter)
+    TP_count = counts['TP'].values[0]
+    FN_count = counts['FN'].values[0]
     
     # Probability of detection
     PD = TP_count/float(TP_count+FN_count)
@@ -222,7 +481,7 @@ def false_alarm_rate(observed, actual, tfilter=None):
     """ 
     Compute false alarm rate (FAR), defined as:
         
-    :math:`FAR=\dfrac{TN}{TN+FP}`
+    :math:`FAR=\dfrac{FP}{TN+FP}`
     
     where 
     :math:`TN` is number of true negatives and  
@@ -230,33 +489,25 @@ def false_alarm_rate(observed, actual, tfilter=None):
     
     Parameters
     ----------
-    estimated : pandas DataFrame
+    observed : pandas DataFrame
         Estimated conditions (True = background, False = anomolous), 
         returned from pm.get_test_results_mask()
     
     actual : pandas DataFrame
         Actual conditions, (True = background, False = anomolous)
     
+    tfilter : pandas Series (optional)
+        Time filter containing boolean values for each time index
+        
     Returns
     -------
     False alarm rate, float
     """
-    # Remove time filter
-    if tfilter is not None:
-        observed = observed[tfilter]
-        actual = actual[tfilter]
-
-    # True negative (TN) = normal condition where tests pass
-    # TN is 1 where the statement is true, Nan where the statement is false
-    TN = (observed.where(observed == True)) == (actual.where(actual == True))
-    TN_count = TN.sum().sum()
-    
-    # False positive (FP) = normal condition where tests fail
-    # FP is 1 where the statement is true, Nan where the statement is false
-    FP = (observed.where(observed == False)+1) == (actual.where(actual == True))
-    FP_count = FP.sum().sum()
+    counts = confusion_matrix(observed, actual, tfilter)
+    TN_count = counts['TN'].values[0]
+    FP_count = counts['FP'].values[0]
     
     # False alarm rate
     FAR = 1-TN_count/float(TN_count+FP_count)
     
-    return FAR
\ No newline at end of file
+    return FAR
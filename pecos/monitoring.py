@@ -7,11 +7,424 @@ import numpy as np
 import re
 import datetime
 import logging
+import pecos.utils
+
+try:
+    from nose.tools import nottest as _nottest
+except ImportError:
+    def _nottest(afunction):
+        return afunction
 
 none_list = ['','none','None','NONE', None, [], {}]
 
 logger = logging.getLogger(__name__)
 
+_expression_cache_size = 1000
+_keyword_cache = {}
+_expression_cache = {}
+
+@_nottest
+class TestResultsStore(object):
+    
+    columns = ['Variable Name', 'Start Time', 'End Time', 'Timesteps', 
+               'Error Flag']
+    
+    def __init__(self, capacity=256):
+        """
+        Columnar store for test results.  Variable names, start time (ns), 
+        end time (ns), number of timesteps, and error flags are stored in 
+        growable typed arrays.  Variable names and error flags are 
+        dictionary-encoded.  The DataFrame representation is created when 
+        requested and cached until new test results are appended.
+        
+        Parameters
+        ----------
+        capacity : int (optional)
+            Initial capacity of the arrays, default = 256
+        """
+        self._size = 0
+        self._variable = np.zeros(capacity, dtype=np.int32)
+        self._start = np.zeros(capacity, dtype=np.int64)
+        self._end = np.zeros(capacity, dtype=np.int64)
+        self._timesteps = np.zeros(capacity, dtype=np.int64)
+        self._flag = np.zeros(capacity, dtype=np.int32)
+        self._variable_names = []
+        self._variable_codes = {}
+        self._flag_names = []
+        self._flag_codes = {}
+        self._tz = None
+        self._frame = None
+        
+    def __len__(self):
+        return self._size
+    
+    def _encode(self, values, names, codes):
+        encoded = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            try:
+                encoded[i] = codes[value]
+            except KeyError:
+                codes[value] = len(names)
+                names.append(value)
+                encoded[i] = codes[value]
+        return encoded
+    
+    def _reserve(self, size):
+        capacity = len(self._start)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity = max(2*capacity, 1)
+        for name in ['_variable', '_start', '_end', '_timesteps', '_flag']:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+    
+    def append(self, variable_name, start_time, end_time, timesteps, 
+               error_flag):
+        """
+        Append test results.
+        
+        Parameters
+        ----------
+        variable_name : list of strings or string
+            Variable name of each test result
+        
+        start_time : DatetimeIndex
+            Start time of each test result
+        
+        end_time : DatetimeIndex
+            End time of each test result
+        
+        timesteps : numpy ndarray
+            Number of timesteps in each test result
+        
+        error_flag : list of strings or string
+            Error flag of each test result
+        """
+        start_time = self._to_datetime(start_time)
+        end_time = self._to_datetime(end_time)
+        n = len(start_time)
+        if n == 0:
+            return
+        if isinstance(variable_name, str):
+            variable_name = [variable_name]*n
+        if isinstance(error_flag, str):
+            error_flag = [error_flag]*n
+        
+        self._reserve(self._size + n)
+        new = slice(self._size, self._size + n)
+        self._variable[new] = self._encode(variable_name, 
+                            self._variable_names, self._variable_codes)
+        self._start[new] = start_time.asi8
+        self._end[new] = end_time.asi8
+        self._timesteps[new] = timesteps
+        self._flag[new] = self._encode(error_flag, 
+                            self._flag_names, self._flag_codes)
+        self._size = self._size + n
+        self._frame = None
+    
+    def merge(self, variable_name, error_flag, times, before, after, 
+              previous_end):
+        """
+        Merge a new test result with existing test results (same variable 
+        name and error flag) that overlap or are adjacent to it.  This is 
+        used to combine test results that continue into new data.  Only 
+        existing test results that end at or before previous_end are merged.
+        
+        Parameters
+        ----------
+        variable_name : string
+            Variable name of the new test result
+        
+        error_flag : string
+            Error flag of the new test result
+        
+        times : DatetimeIndex
+            Times in the new test result
+        
+        before : Timestamp or None
+            Time before the new test result, None if unknown
+        
+        after : Timestamp or None
+            Time after the new test result, None if unknown
+        
+        previous_end : Timestamp
+            End time of the data used to generate existing test results
+        
+        Returns
+        -------
+        True if the new test result was merged with existing test results
+        """
+        variable_code = self._variable_codes.get(variable_name)
+        flag_code = self._flag_codes.get(error_flag)
+        if variable_code is None or flag_code is None:
+            return False
+        
+        times = self._to_datetime(times).asi8
+        if before is None:
+            before = times[0]
+        else:
+            before = self._to_datetime([before]).asi8[0]
+        if after is None:
+            after = times[-1]
+        else:
+            after = self._to_datetime([after]).asi8[0]
+        previous_end = self._to_datetime([previous_end]).asi8[0]
+        
+        n = self._size
+        rows = np.where((self._variable[:n] == variable_code) & 
+                        (self._flag[:n] == flag_code) & 
+                        (self._end[:n] >= before) & 
+                        (self._start[:n] <= after) & 
+                        (self._end[:n] <= previous_end))[0]
+        if len(rows) == 0:
+            return False
+        
+        # Number of timesteps in the new test result that are not already 
+        # included in existing test results
+        covered = np.zeros(len(times), dtype=bool)
+        for row in rows:
+            covered |= (times >= self._start[row]) & (times <= self._end[row])
+        
+        row = rows[0]
+        self._start[row] = min(self._start[rows].min(), times[0])
+        self._end[row] = max(self._end[rows].max(), times[-1])
+        self._timesteps[row] = self._timesteps[rows].sum() + (~covered).sum()
+        self._remove(rows[1:])
+        self._frame = None
+        
+        return True
+    
+    def _remove(self, rows):
+        if len(rows) == 0:
+            return
+        keep = np.ones(self._size, dtype=bool)
+        keep[rows] = False
+        n = keep.sum()
+        for name in ['_variable', '_start', '_end', '_timesteps', '_flag']:
+            values = getattr(self, name)
+            values[:n] = values[:self._size][keep]
+        self._size = n
+        self._frame = None
+    
+    def append_dataframe(self, test_results):
+        """
+        Append test results stored in a DataFrame.
+        
+        Parameters
+        ----------
+        test_results : pandas DataFrame
+            Test results, with columns 'Variable Name', 'Start Time', 
+            'End Time', 'Timesteps', and 'Error Flag'
+        """
+        if test_results.shape[0] == 0:
+            return
+        self.append(list(test_results['Variable Name']), 
+                    test_results['Start Time'], 
+                    test_results['End Time'], 
+                    np.asarray(test_results['Timesteps'], dtype=np.int64),
+                    list(test_results['Error Flag']))
+    
+    def _to_datetime(self, values):
+        # Times without a time zone are assumed to be in the time zone of 
+        # the store.  Object arrays can mix times with and without a time 
+        # zone, so each value is converted separately
+        if not isinstance(values, (pd.Index, pd.Series, np.ndarray)):
+            values = np.asarray(values, dtype=object)
+        if values.dtype == object:
+            time = [pd.Timestamp(value) for value in values]
+            if self._tz is None:
+                tz = [t.tz for t in time if t is not pd.NaT and t.tz is not None]
+                if len(tz) > 0:
+                    self._tz = tz[0]
+            if self._tz is not None:
+                time = [t if t is pd.NaT or t.tz is not None 
+                        else t.tz_localize(self._tz) for t in time]
+                time = [t if t is pd.NaT else t.tz_convert(self._tz) 
+                        for t in time]
+            time = pd.DatetimeIndex(time)
+        else:
+            time = pd.DatetimeIndex(values)
+        if time.tz is not None:
+            if self._tz is None:
+                self._tz = time.tz
+        elif self._tz is not None:
+            time = time.tz_localize(self._tz)
+        return time
+        
+    def _to_time(self, values):
+        time = pd.DatetimeIndex(values)
+        if self._tz is not None:
+            time = time.tz_localize('UTC').tz_convert(self._tz)
+        return time
+        
+    def to_dataframe(self):
+        """
+        Return the test results as a DataFrame.
+        
+        Returns
+        -------
+        pandas DataFrame with columns 'Variable Name', 'Start Time', 
+        'End Time', 'Timesteps', and 'Error Flag'
+        """
+        if self._frame is not None:
+            return self._frame
+        
+        if self._size == 0:
+            self._frame = pd.DataFrame(columns=self.columns)
+            return self._frame
+        
+        n = self._size
+        variable_names = np.array(self._variable_names + [None], dtype=object)[:-1]
+        flag_names = np.array(self._flag_names + [None], dtype=object)[:-1]
+        
+        self._frame = pd.DataFrame({
+            'Variable Name': variable_names[self._variable[:n]],
+            'Start Time': self._to_time(self._start[:n]),
+            'End Time': self._to_time(self._end[:n]),
+            'Timesteps': self._timesteps[:n].astype(object),
+            'Error Flag': flag_names[self._flag[:n]]},
+            columns=self.columns)
+        
+        return self._frame
+
+class IntervalMask(object):
+
+    def __init__(self, index, columns, col, start, stop):
+        """
+        Boolean mask stored as intervals.  The mask is True within the
+        intervals [start, stop) (integer row positions) of each column and
+        False elsewhere.  Overlapping and adjacent intervals are merged.
+        Memory use depends on the number of intervals instead of the size
+        of the mask.  Masks with the same shape can be combined using |
+        (union), & (intersection) and ~ (complement) without creating a
+        dense mask.
+
+        Parameters
+        ----------
+        index : pandas Index
+            Index of the mask
+
+        columns : pandas Index or list
+            Columns of the mask
+
+        col : numpy ndarray
+            Column (integer position) of each interval
+
+        start : numpy ndarray
+            Start row of each interval (inclusive)
+
+        stop : numpy ndarray
+            Stop row of each interval (exclusive)
+        """
+        self.index = index
+        self.columns = pd.Index(columns)
+
+        nrows = len(index)
+        col = np.asarray(col, dtype=np.int64)
+        start = np.clip(np.asarray(start, dtype=np.int64), 0, nrows)
+        stop = np.clip(np.asarray(stop, dtype=np.int64), 0, nrows)
+        keep = stop > start
+
+        # Intervals are sorted and merged using keys that are increasing
+        # across columns, intervals in different columns are never adjacent
+        key_start = (col*(nrows+1) + start)[keep]
+        key_stop = (col*(nrows+1) + stop)[keep]
+        order = np.argsort(key_start, kind='mergesort')
+        key_start = key_start[order]
+        key_stop = key_stop[order]
+        if len(key_start) > 0:
+            reach = np.maximum.accumulate(key_stop)
+            first = np.ones(len(key_start), dtype=bool)
+            first[1:] = key_start[1:] > reach[:-1]
+            first = np.where(first)[0]
+            last = np.append(first[1:]-1, len(key_start)-1)
+            key_start = key_start[first]
+            key_stop = reach[last]
+
+        self.col = key_start // (nrows+1)
+        self.start = key_start - self.col*(nrows+1)
+        self.stop = key_stop - self.col*(nrows+1)
+
+    @property
+    def shape(self):
+        return (len(self.index), len(self.columns))
+
+    @classmethod
+    def from_dataframe(cls, mask):
+        """
+        Create an IntervalMask from a DataFrame with boolean values.
+        """
+        col, start, stop = _find_blocks(mask.values.T.astype(bool))
+        return cls(mask.index, mask.columns, col, start, stop+1)
+
+    @classmethod
+    def from_rows(cls, index, columns, start, stop):
+        """
+        Create an IntervalMask which is True within the intervals
+        [start, stop) (integer row positions) of all columns.
+        """
+        ncols = len(columns)
+        start = np.asarray(start, dtype=np.int64)
+        stop = np.asarray(stop, dtype=np.int64)
+        col = np.repeat(np.arange(ncols), len(start))
+        return cls(index, columns, col, np.tile(start, ncols),
+                   np.tile(stop, ncols))
+
+    def to_dataframe(self):
+        """
+        Convert the IntervalMask to a DataFrame with boolean values.
+        """
+        mask = pecos.utils.intervals_to_mask(self.start, self.stop, self.col, 
+                                             self.shape)
+        return pd.DataFrame(mask, index=self.index, columns=self.columns)
+
+    def sum(self):
+        """
+        Return the number of True values in each column (pandas Series).
+        """
+        counts = np.bincount(self.col, weights=self.stop-self.start,
+                             minlength=len(self.columns))
+        return pd.Series(counts.astype(np.int64), index=self.columns)
+
+    def filter_rows(self, rows):
+        """
+        Return an IntervalMask which is False for rows where rows is False
+        (i.e. a time filter), rows is a boolean array or Series.
+        """
+        rows = np.asarray(rows, dtype=bool)
+        _, start, stop = _find_blocks(rows[np.newaxis,:])
+        return self & IntervalMask.from_rows(self.index, self.columns,
+                                             start, stop+1)
+
+    def _check_shape(self, other):
+        if not isinstance(other, IntervalMask):
+            raise TypeError("Masks must be IntervalMask objects")
+        if self.shape != other.shape:
+            raise ValueError("Masks must have the same shape")
+
+    def __or__(self, other):
+        self._check_shape(other)
+        return IntervalMask(self.index, self.columns,
+                            np.append(self.col, other.col),
+                            np.append(self.start, other.start),
+                            np.append(self.stop, other.stop))
+
+    def __and__(self, other):
+        return ~(~self | ~other)
+
+    def __invert__(self):
+        # Gaps between intervals, including the start and end of each column
+        nrows, ncols = self.shape
+        offset = np.arange(ncols)*(nrows+1)
+        key_start = np.sort(np.append(offset, self.col*(nrows+1)+self.stop))
+        key_stop = np.sort(np.append(self.col*(nrows+1)+self.start, offset+nrows))
+        col = key_start // (nrows+1)
+        return IntervalMask(self.index, self.columns, col,
+                            key_start - col*(nrows+1), key_stop - col*(nrows+1))
+
 class PerformanceMonitoring(object):
 
     def __init__(self):
@@ -21,21 +434,60 @@ class PerformanceMonitoring(object):
         self.df = pd.DataFrame()
         self.trans = {}
         self.tfilter = pd.Series()
-        self.test_results = pd.DataFrame(columns=['Variable Name',
-                                                'Start Time', 'End Time',
-                                                'Timesteps', 'Error Flag'])
+        self._test_results = TestResultsStore()
+        self._previous_end = None
+        self.chunk_size = None
+        self._chunk_columns = None
+    
+    @property
+    def df(self):
+        """
+        Data, pandas DataFrame.  Rolling means and rolling statistics used 
+        in quality control tests are cached until a new DataFrame is 
+        assigned to df (or data is added using add_dataframe or 
+        append_dataframe).  If df is modified in place, assign it again 
+        (pm.df = pm.df) to clear the cache.
+        """
+        return self._df
+    
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self._rolling_cache = {}
+    
+    @property
+    def test_results(self):
+        """
+        Test results, pandas DataFrame with columns 'Variable Name', 
+        'Start Time', 'End Time', 'Timesteps', and 'Error Flag'.
+        Test results are stored in a TestResultsStore and the DataFrame is 
+        created when requested.  To modify test results, assign a new 
+        DataFrame to test_results.
+        """
+        return self._test_results.to_dataframe()
+    
+    @test_results.setter
+    def test_results(self, test_results):
+        self._test_results = TestResultsStore()
+        self._test_results.append_dataframe(test_results)
 
-    def _setup_data(self, key, rolling_mean):
+    def _setup_data(self, key, rolling_mean, lookback=0, lookback_rows=0):
         """
         Setup DataFrame, by (optionally) extracting a column and/or smoothing
-        data using rolling window mean.
+        data using rolling window mean.  If new data was appended using 
+        append_dataframe, only the new data and the data needed to compute 
+        the test on the new data (lookback, in seconds and rows, plus the 
+        rolling mean window) is returned.  If lookback is None, all data is 
+        returned.
         """
         if self.df.empty:
             logger.info("Empty database")
             return
 
-        # Isolate subset if key is not None
-        if key is not None:
+        # Isolate subset if key is not None, or the current column chunk
+        if self._chunk_columns is not None:
+            df = self.df[self._chunk_columns]
+        elif key is not None:
             try:
                 df = self.df[self.trans[key]]
             except:
@@ -43,46 +495,268 @@ class PerformanceMonitoring(object):
                 return
         else:
             df = self.df
-
+        
+        # Isolate new data (and lookback) if data was appended
+        if lookback is not None:
+            start = self._lookback_position(rolling_mean + lookback, 
+                                            lookback_rows)
+            if start > 0:
+                df = df.iloc[start:]
+        
         # Compute moving average
         if rolling_mean > 0:
             rolling_mean_str = str(rolling_mean) + 's' 
-            df = df.rolling(rolling_mean_str).mean()
+            df = self._rolling(df, rolling_mean_str, 'mean')
         
         return df
     
+    def _rolling(self, df, window, statistic, rolling_mean=0):
+        """
+        Compute a rolling statistic (i.e. 'mean', 'std', 'median' or 'mad') 
+        of df, where df is a subset of columns and the last rows of self.df 
+        (smoothed using rolling_mean, in seconds).  'mad' is the median 
+        absolute deviation from the median of each window.  Results 
+        are cached using the columns, number of rows, rolling_mean, window 
+        and statistic.  The cache is cleared when self.df changes.  Results 
+        are shared between tests and should not be modified in place.
+        """
+        cache_key = (tuple(df.columns), df.shape[0], rolling_mean, window, 
+                     statistic)
+        try:
+            return self._rolling_cache[cache_key]
+        except KeyError:
+            pass
+        
+        if statistic == 'mad':
+            window_ns = pd.Timedelta(window).value
+            mad = _rolling_median_mad(df.values, df.index.asi8, window_ns)[1]
+            result = pd.DataFrame(mad, index=df.index, columns=df.columns)
+        else:
+            result = getattr(df.rolling(window), statistic)()
+        self._rolling_cache[cache_key] = result
+        
+        return result
+    
+    def _column_chunks(self, key):
+        """
+        Return a list of column chunks (lists of column names, chunk_size 
+        columns each) used to run a test, or None if the test is run on all 
+        columns at once.
+        """
+        if self.chunk_size is None or self._chunk_columns is not None:
+            return None
+        if self.df.empty:
+            return None
+        if key is None:
+            columns = list(self.df.columns)
+        elif key in self.trans:
+            columns = list(self.trans[key])
+        else:
+            return None
+        
+        size = max(int(self.chunk_size), 1)
+        if len(columns) <= size:
+            return None
+        
+        return [columns[i:i+size] for i in range(0, len(columns), size)]
+    
+    def _run_in_chunks(self, key, method, *args, **kwds):
+        """
+        Run a quality control test (method) for each column chunk.  Only 
+        the columns in the chunk are loaded into memory, and rolling 
+        statistics are removed from the cache after each chunk.  Returns 
+        False if the test is not run in chunks.
+        """
+        chunks = self._column_chunks(key)
+        if chunks is None:
+            return False
+        
+        for columns in chunks:
+            self._chunk_columns = columns
+            try:
+                method(*args, **kwds)
+            finally:
+                self._chunk_columns = None
+                self._rolling_cache = {}
+        
+        return True
+    
+    def _lookback_position(self, lookback, lookback_rows):
+        """
+        Return the position of the first row in df needed to test new data,
+        0 if all data needs to be tested.
+        """
+        index = self.df.index
+        if self._previous_end is None or not index.is_monotonic_increasing:
+            return 0
+        
+        start = index.searchsorted(self._previous_end, side='right')
+        start = max(start - lookback_rows, 0)
+        if lookback > 0 and start < len(index):
+            start_time = index[start] - pd.Timedelta(seconds=lookback)
+            start = index.searchsorted(start_time, side='left')
+        
+        return start
+    
     def _generate_test_results(self, df, bound, specs, min_failures, error_prefix):
         """
-        Compare DataFrame to bounds to generate a True/False mask where
-        True = passed, False = failed.  Append results to test_results.
+        Compare DataFrame to bounds and append test results.  Each data 
+        point is classified as below the lower bound, within bounds, or 
+        above the upper bound, and blocks of consecutive failures are 
+        extracted for both bounds at once.
         """
+        lower, upper = self._evaluate_bound(bound, specs)
+        if lower is None and upper is None:
+            return
         
-        # Evaluate strings in bound values
-        for i in range(len(bound)):
-            if bound[i] in none_list:
-                bound[i] = None
-            elif type(bound[i]) is str:
-                bound[i] = self.evaluate_string('', bound[i], specs)
+        values = df.values
+        lower, lower_names = self._bound_array(lower, bound[0], df)
+        upper, upper_names = self._bound_array(upper, bound[1], df)
+        with np.errstate(invalid='ignore'):
+            below = None if lower is None else (values < lower)
+            above = None if upper is None else (values > upper)
         
-        # Lower Bound
-        if bound[0] is not None:
-            mask = (df < bound[0])
-            error_msg = error_prefix+' < lower bound, '+str(bound[0])
-            self._append_test_results(mask, error_msg, min_failures) 
-
-        # Upper Bound
-        if bound[1] is not None:
-            mask = (df > bound[1])
-            error_msg = error_prefix+' > upper bound, '+str(bound[1])
-            self._append_test_results(mask, error_msg, min_failures) 
- 
+        if below is not None and above is not None and (below & above).any():
+            # The lower bound is greater than the upper bound, data points 
+            # can fail both bounds
+            codes = [-below.astype(np.int8), above.astype(np.int8)]
+        else:
+            code = np.zeros(values.shape, dtype=np.int8)
+            if below is not None:
+                code[below] = -1
+            if above is not None:
+                code[above] = 1
+            codes = [code]
+        
+        # Remove time filter and data that was already tested, then extract 
+        # blocks of consecutive failures for both bounds
+        rows = self._untested_rows(df.index)
+        blocks = []
+        for code in codes:
+            if rows is not None:
+                code[~rows] = 0
+            code = code.T
+            col, start_row, stop_row = _find_blocks(code)
+            blocks.append((code[col, start_row], col, start_row, stop_row))
+        
+        # Lower bound test results are appended before upper bound results
+        for sign, value, names in [(-1, lower, lower_names), (1, upper, upper_names)]:
+            if value is None:
+                continue
+            if sign < 0:
+                error_msgs = [error_prefix+' < lower bound, '+name for name in names]
+            else:
+                error_msgs = [error_prefix+' > upper bound, '+name for name in names]
+            for direction, col, start_row, stop_row in blocks:
+                select = direction == sign
+                if not select.any():
+                    continue
+                if len(error_msgs) == 1:
+                    error_msg = error_msgs[0]
+                else:
+                    error_msg = np.asarray(error_msgs, dtype=object)[col[select]]
+                self._store_blocks(df.index, df.columns, col[select], 
+                                   start_row[select], stop_row[select], 
+                                   error_msg, min_failures)
+    
+    def _evaluate_bound(self, bound, specs):
+        """
+        Return the lower and upper bound, where strings are evaluated and 
+        values in none_list are None.  The bound is not modified.
+        """
+        values = []
+        for value in bound:
+            if isinstance(value, (pd.Series, pd.DataFrame, np.ndarray)):
+                pass
+            elif value in none_list:
+                value = None
+            elif type(value) is str:
+                value = self.evaluate_string('', value, specs)
+            values.append(value)
+        return values
+    
+    def _bound_array(self, bound, original, df):
+        """
+        Convert an evaluated bound to an array that is compared to df.values
+        and the name of the bound used in error flags (one name, or one name 
+        per column of df).
+        
+        - Scalar bounds are compared to all data points
+        - Lists and arrays (one value per column) are per column bounds
+        - Dictionaries of {column name or translation key: value} and 
+          Series indexed by column names are per column bounds, columns that 
+          are not included are not tested
+        - Series indexed by time and DataFrames with one column are 
+          time-varying bounds, aligned to the index of df and compared to 
+          each column
+        - DataFrames are aligned to the index and columns of df
+        """
+        if bound is None:
+            return None, None
+        
+        if isinstance(bound, dict):
+            per_column = {}
+            for key, value in bound.items():
+                if key in df.columns:
+                    per_column[key] = value
+                elif key in self.trans:
+                    for col in self.trans[key]:
+                        per_column.setdefault(col, value)
+            bound = pd.Series(per_column, dtype=object)
+        
+        if isinstance(bound, pd.DataFrame):
+            if bound.shape[1] == 1:
+                bound = bound.iloc[:,0]
+            else:
+                bound = bound.reindex(index=df.index, columns=df.columns)
+                return bound.values.astype('float64'), [_bound_name(original)]
+        
+        if isinstance(bound, pd.Series):
+            if isinstance(bound.index, pd.DatetimeIndex):
+                bound = bound.reindex(df.index).values.astype('float64')
+                return bound[:,None], [_bound_name(original)]
+            else:
+                bound = bound.reindex(df.columns)
+                names = [str(value) for value in bound.values]
+                return bound.values.astype('float64'), names
+        
+        if isinstance(bound, (list, tuple, np.ndarray)):
+            names = [str(value) for value in bound]
+            return np.asarray(bound, dtype='float64'), names
+        
+        return bound, [str(bound)]
+    
+    def _time_filter_rows(self, index):
+        """
+        Return a boolean array which is False for rows removed by the time 
+        filter, or None if there is no time filter.
+        """
+        if self.tfilter.empty:
+            return None
+        tfilter = self.tfilter
+        if not tfilter.index.equals(index):
+            tfilter = tfilter.reindex(index, fill_value=True)
+        return tfilter.values.astype(bool)
+    
+    def _untested_rows(self, index):
+        """
+        Return a boolean array which is False for rows removed by the time 
+        filter and rows that were tested before new data was appended using 
+        append_dataframe, or None if all rows are tested.
+        """
+        rows = self._time_filter_rows(index)
+        if self._previous_end is not None:
+            untested = np.asarray(index > self._previous_end)
+            rows = untested if rows is None else (rows & untested)
+        return rows
+    
     def _append_test_results(self, mask, error_msg, min_failures=1, use_mask_only=False): 
         """
         Append QC results to the PerformanceMonitoring object.
 
         Parameters
         ----------
-        mask : pandas DataFrame
+        mask : pandas DataFrame or IntervalMask
             Result from quality control test, boolean values
 
         error_msg : string
@@ -98,78 +772,108 @@ class PerformanceMonitoring(object):
             test_results. When False, the mask is used in combination with 
             pm.df to extract test results. Default = False
         """
-        if not self.tfilter.empty:
-            mask[~self.tfilter] = False
-        if mask.sum(axis=1).sum(axis=0) == 0:
-            return
-                
+        if not isinstance(mask, IntervalMask):
+            mask = IntervalMask.from_dataframe(mask)
+        
+        # Remove time filter and data that was already tested
+        rows = self._untested_rows(mask.index)
+        if rows is not None:
+            mask = mask.filter_rows(rows)
+        
+        # Intervals are ordered by column, then by time
+        self._store_blocks(mask.index, mask.columns, mask.col, mask.start, 
+                           mask.stop-1, error_msg, min_failures, use_mask_only)
+    
+    def _store_blocks(self, index, columns, start_col_idx, start_row_idx, 
+                      stop_row_idx, error_msg, min_failures=1, 
+                      use_mask_only=False):
+        """
+        Append blocks of consecutive failures (column, start row and stop 
+        row of each block) to test_results.  error_msg is a string, or an 
+        array with the error message of each block.  If data was appended 
+        using append_dataframe, blocks that overlap or are adjacent to 
+        previous test results (same variable and error message) are merged 
+        with the previous test results.
+        """
+        length = stop_row_idx - start_row_idx + 1
+        if isinstance(error_msg, str):
+            error_msg = np.array([error_msg]*len(length), dtype=object)
+        
         if use_mask_only:
-            sub_df = mask 
+            var_names = np.array(['']*len(start_col_idx), dtype=object)
         else:
-            sub_df = self.df[mask.columns]
-
-        # Find blocks
-        order = 'col'
-        if order == 'col':
-            mask = mask.T
-
-        np_mask = mask.values
-
-        start_nans_mask = np.hstack(
-            (np.resize(np_mask[:,0],(mask.shape[0],1)),
-             np.logical_and(np.logical_not(np_mask[:,:-1]), np_mask[:,1:])))
-        stop_nans_mask = np.hstack(
-            (np.logical_and(np_mask[:,:-1], np.logical_not(np_mask[:,1:])),
-             np.resize(np_mask[:,-1], (mask.shape[0],1))))
-
-        start_row_idx,start_col_idx = np.where(start_nans_mask)
-        stop_row_idx,stop_col_idx = np.where(stop_nans_mask)
-
-        if order == 'col':
-            temp = start_row_idx; start_row_idx = start_col_idx; start_col_idx = temp
-            temp = stop_row_idx; stop_row_idx = stop_col_idx; stop_col_idx = temp
-            #mask = mask.T
-
-        block = {'Start Row': list(start_row_idx),
-                 'Start Col': list(start_col_idx),
-                 'Stop Row': list(stop_row_idx),
-                 'Stop Col': list(stop_col_idx)}
-
-        #if sub_df is None:
-        #    sub_df = self.df
-
-        for i in range(len(block['Start Col'])):
-            length = block['Stop Row'][i] - block['Start Row'][i] + 1
-            if length >= min_failures:
-                if use_mask_only:
-                    var_name = ''
+            var_names = np.asarray(columns, dtype=object)[start_col_idx]
+        
+        # Merge blocks that start at or before the first new time with 
+        # previous test results
+        keep = np.ones(len(length), dtype=bool)
+        if self._previous_end is not None and index.is_monotonic_increasing:
+            first_new = index.searchsorted(self._previous_end, side='right')
+            for i in np.where(start_row_idx <= first_new)[0]:
+                start, stop = start_row_idx[i], stop_row_idx[i]
+                if start > 0:
+                    before = index[start-1]
+                elif first_new == 0:
+                    before = self._previous_end
                 else:
-                    var_name = sub_df.iloc[:,block['Start Col'][i]].name #sub_df.icol(block['Start Col'][i]).name
-                    
-                frame = pd.DataFrame([var_name,
-                    sub_df.index[block['Start Row'][i]],
-                    sub_df.index[block['Stop Row'][i]],
-                    length, error_msg],
-                    index=['Variable Name', 'Start Time', 
-                    'End Time', 'Timesteps', 'Error Flag'])
-                frame_t = frame.transpose()
-                self.test_results = self.test_results.append(frame_t, ignore_index=True)
+                    before = None
+                if stop+1 < len(index):
+                    after = index[stop+1]
+                else:
+                    after = None
+                merged = self._test_results.merge(var_names[i], error_msg[i], 
+                                index[start:stop+1], before, after, 
+                                self._previous_end)
+                keep[i] = not merged
+        
+        # Remove blocks that are shorter than min_failures
+        keep = keep & (length >= min_failures)
+        if not keep.any():
+            return
+        
+        self._test_results.append(list(var_names[keep]), 
+                                  index[start_row_idx[keep]], 
+                                  index[stop_row_idx[keep]], 
+                                  length[keep], list(error_msg[keep]))
     
     def add_dataframe(self, df):
         """
         Add DataFrame to the PerformanceMonitoring object.
 
+        New data overrides existing data if DataFrames share indexes and 
+        columns.  If the index of df is equal to (or a subset of) the 
+        existing index and all columns in df are new, the columns are added 
+        to the existing DataFrame without realigning the existing data.
+
         Parameters
         -----------
         df : pandas DataFrame
             DataFrame to add to the PerformanceMonitoring object
         """
-        temp = df.copy()
-
-        if self.df is not None:
-            self.df = temp.combine_first(self.df)
+        if self.df is None or self.df.shape == (0, 0):
+            self.df = df.copy()
+        elif self._can_add_columns(df):
+            # Insert new columns at the position they would have in the 
+            # union of columns (which is what combine_first returns)
+            if df.index.equals(self.df.index):
+                data = dict((col, df[col].values) for col in df.columns)
+            else:
+                data = dict((col, df[col]) for col in df.columns)
+                # Use the same index as combine_first (outer join, the 
+                # index frequency is not kept)
+                self.df.index = self.df.index.join(df.index, how='outer')
+            columns = self.df.columns.union(df.columns)
+            if columns.drop(df.columns).equals(self.df.columns):
+                for col in columns[columns.isin(df.columns)]:
+                    self.df.insert(columns.get_loc(col), col, data[col])
+            else:
+                for col in df.columns:
+                    self.df[col] = data[col]
+                self.df = self.df[columns]
         else:
-            self.df = temp.copy()
+            temp = df.copy()
+            self.df = temp.combine_first(self.df)
+        self._rolling_cache = {}
 
         # Add identity 1:1 translation dictionary
         trans = {}
@@ -177,6 +881,104 @@ class PerformanceMonitoring(object):
             trans[col] = [col]
 
         self.add_translation_dictionary(trans)
+    
+    def add_column_store(self, directory, mmap_mode='c', chunk_size=100):
+        """
+        Add data from a column store (see io.write_column_store) to the 
+        PerformanceMonitoring object.  Data is memory-mapped, one contiguous 
+        array for each column, and is not loaded into memory.  Quality 
+        control tests are run in chunks of columns, only the columns in 
+        each chunk are loaded into memory.  Test results are the same as 
+        running the test on all columns at once, but can be in a different 
+        order.  If the PerformanceMonitoring object already contains data, 
+        the column store is added using add_dataframe (data is loaded into 
+        memory).
+
+        Parameters
+        -----------
+        directory : string
+            Column store directory
+        
+        mmap_mode : string (optional)
+            Memory-map mode (see numpy.load), default = 'c' (copy-on-write, 
+            changes, i.e. corrupt data replaced by NaN, are not written to 
+            the column store)
+        
+        chunk_size : int or None (optional)
+            Number of columns in each chunk, stored as pm.chunk_size, 
+            default = 100.  If chunk_size is None, tests are run on all 
+            columns at once.
+        """
+        # pecos.io imports pecos.graphics, which imports pecos.monitoring
+        import pecos.io
+        
+        df = pecos.io.read_column_store(directory, mmap_mode)
+        if self.df is None or self.df.shape == (0, 0):
+            self.df = df
+            
+            # Add identity 1:1 translation dictionary
+            trans = {}
+            for col in df.columns:
+                trans[col] = [col]
+            self.add_translation_dictionary(trans)
+        else:
+            self.add_dataframe(df)
+        self.chunk_size = chunk_size
+    
+    def _can_add_columns(self, df):
+        """
+        Return True if df only contains new columns and the index of df is 
+        equal to (or a subset of) the existing index.
+        """
+        if not (df.columns.is_unique and self.df.columns.is_unique):
+            return False
+        if df.columns.isin(self.df.columns).any():
+            return False
+        if df.index.equals(self.df.index):
+            return True
+        
+        return (df.index.dtype == self.df.index.dtype and 
+                df.index.is_unique and self.df.index.is_unique and 
+                self.df.index.is_monotonic_increasing and 
+                df.index.isin(self.df.index).all())
+
+    def append_dataframe(self, df):
+        """
+        Append new data to the PerformanceMonitoring object for incremental
+        analysis.  Quality control tests that are run after data is appended
+        only test the new data.  Data that occurs before the new data
+        (defined by the rolling mean, increment, and window used in each test)
+        is used to compute the test, but is not tested again.  Test
+        failures that continue from the previous data are merged with
+        existing test results.  Data that exists when new data is appended
+        is considered tested.  New data should start after the last
+        timestamp in the existing data, earlier timestamps are added but not
+        tested.
+
+        Note that min_failures is applied to new blocks of failures that
+        do not continue from the previous data.  A block of failures at the
+        end of the data that is shorter than min_failures is not reported,
+        even if it continues into data that is appended later.
+
+        Parameters
+        -----------
+        df : pandas DataFrame
+            DataFrame to append to the PerformanceMonitoring object
+        """
+        if self.df.empty:
+            self.add_dataframe(df)
+            return
+
+        self._previous_end = self.df.index.max()
+        self.df = pd.concat([self.df, df])
+
+        # Add identity 1:1 translation dictionary for new columns
+        trans = {}
+        for col in df.columns:
+            if col not in self.trans:
+                trans[col] = [col]
+
+        self.add_translation_dictionary(trans)
 
     def add_translation_dictionary(self, trans):
         """
@@ -272,12 +1074,18 @@ class PerformanceMonitoring(object):
             If False, times only need to occur once or more within each 
             interval (specified in frequency) and the DataFrame is not 
             reindexed.
+
+        A TypeError is raised if the index is not a DatetimeIndex.
         """
         logger.info("Check timestamp")
 
         if self.df.empty:
             logger.info("Empty database")
             return
+        if not isinstance(self.df.index, pd.DatetimeIndex):
+            raise TypeError("The index must be a DatetimeIndex to check "
+                            "timestamps, index type is " + 
+                            type(self.df.index).__name__)
         if expected_start_time is None:
             expected_start_time = min(self.df.index)
         if expected_end_time is None:
@@ -314,21 +1122,26 @@ class PerformanceMonitoring(object):
         del mask['TEMP']
 
         # Drop duplicate timestamps (this has to be done before the
-        # results are appended)
-        self.df['TEMP'] = self.df.index
-        #self.df.drop_duplicates(subset='TEMP', take_last=False, inplace=True)
-        self.df.drop_duplicates(subset='TEMP', keep='first', inplace=True)
+        # results are appended).  Data is not copied if there are no 
+        # duplicate timestamps
+        if self.df.index.has_duplicates:
+            self.df['TEMP'] = self.df.index
+            #self.df.drop_duplicates(subset='TEMP', take_last=False, inplace=True)
+            self.df.drop_duplicates(subset='TEMP', keep='first', inplace=True)
+            del self.df['TEMP']
+            self._rolling_cache = {}
 
         self._append_test_results(mask, 'Duplicate timestamp',
                                  use_mask_only=True,
                                  min_failures=min_failures)
-        del self.df['TEMP']
         
         if exact_times:
             temp = pd.Index(rng)
             missing = temp.difference(self.df.index).tolist()
-            # reindex DataFrame
-            self.df = self.df.reindex(index=rng)
+            # reindex DataFrame (data is not copied if no timestamps are 
+            # missing)
+            if not self.df.index.equals(rng):
+                self.df = self.df.reindex(index=rng)
             mask = pd.DataFrame(data=self.df.shape[0]*[False],
                                 index=self.df.index)
             mask.loc[missing] = True
@@ -350,9 +1163,13 @@ class PerformanceMonitoring(object):
 
         Parameters
         ----------
-        bound : list of floats
+        bound : list
             [lower bound, upper bound], None can be used in place of a lower 
-            or upper bound
+            or upper bound.  Each bound can be a float, a string (evaluated 
+            using evaluate_string), a dictionary of {column name or translation 
+            key: float} or a list of floats (one per column), a pandas Series 
+            indexed by column names (per column bounds) or by time (time-varying 
+            bound), or a pandas DataFrame aligned to the data
 
         key : string (optional)
             Translation dictionary key.  If not specified, all columns are 
@@ -369,6 +1186,10 @@ class PerformanceMonitoring(object):
             Minimum number of consecutive failures required for reporting, 
             default = 1
         """
+        if self._run_in_chunks(key, self.check_range, bound, key, specs, rolling_mean, 
+                               min_failures):
+            return
+        
         logger.info("Check data range")
 
         df = self._setup_data(key, rolling_mean)
@@ -387,9 +1208,13 @@ class PerformanceMonitoring(object):
 
         Parameters
         ----------
-        bound : list of floats
+        bound : list
             [lower bound, upper bound], None can be used in place of a lower 
-            or upper bound
+            or upper bound.  Each bound can be a float, a string (evaluated 
+            using evaluate_string), a dictionary of {column name or translation 
+            key: float} or a list of floats (one per column), a pandas Series 
+            indexed by column names (per column bounds) or by time (time-varying 
+            bound), or a pandas DataFrame aligned to the data
 
         key : string (optional)
             Translation dictionary key. If not specified, all columns are 
@@ -412,9 +1237,14 @@ class PerformanceMonitoring(object):
             Minimum number of consecutive failures required for reporting,
             default = 1
         """
+        if self._run_in_chunks(key, self.check_increment, bound, key, specs, 
+                               increment, absolute_value, rolling_mean, 
+                               min_failures):
+            return
+        
         logger.info("Check increment range")
 
-        df = self._setup_data(key, rolling_mean)
+        df = self._setup_data(key, rolling_mean, lookback_rows=abs(increment))
         if df is None:
             return
         
@@ -439,9 +1269,8 @@ class PerformanceMonitoring(object):
                     absolute_value=True, rolling_mean=0, min_failures=1):
         """
         Check bounds on the difference between max and min data values within 
-		  a rolling window (Note, this method is currently NOT efficient for large 
-        data sets (> 100000 pts) because it uses df.rolling().apply() to find 
-        the position of the min and max). This method requires pandas 0.23 or greater.
+        a rolling window.  The min and max (and the position of each) are 
+        computed for all windows at once, which requires a monotonic index.
 
         Parameters
         ----------
@@ -471,45 +1300,28 @@ class PerformanceMonitoring(object):
             Minimum number of consecutive failures required for reporting, 
             default = 1
         """
+        if self._run_in_chunks(key, self.check_delta, bound, key, specs, window, 
+                               absolute_value, rolling_mean, min_failures):
+            return
+        
         logger.info("Check delta (max-min) range")
 
-        df = self._setup_data(key, rolling_mean)
+        df = self._setup_data(key, rolling_mean, lookback=window)
         if df is None:
             return
         
-        window_str = str(int(window*1e6)) + 'us'
+        if not df.index.is_monotonic_increasing:
+            raise ValueError("index must be monotonic")
 
-        def f(data=None, method=None):
-            if data.notnull().sum() < 2: # there has to be at least two numbers
-                return np.nan
-            else:
-                if method == 'idxmin':
-                    # Can't return a timestamp, convert to num, then back to timestamp
-                    return data.idxmin().value 
-                elif method == 'min':
-                    return data.min()
-                elif method == 'idxmax':
-                    return data.idxmax().value
-                elif method == 'max':
-                    return data.max()
-                else:
-                    return np.nan
-                
-        tmin_df = df.rolling(window_str).apply(lambda x: f(x, 'idxmin'), raw=False) # raw = False passes a Series
-        tmin_df = tmin_df.astype('datetime64[ns]')
-        # Note, the next line should be replaced with df.rolling(window_str).min(), 
-        # but the solution is not the same with pandas 0.23
-        min_df = df.rolling(window_str).apply(lambda x: f(x, 'min'), raw=False)
-        
-        tmax_df = df.rolling(window_str).apply(lambda x: f(x, 'idxmax'), raw=False)
-        tmax_df = tmax_df.astype('datetime64[ns]')
-        # Same note as above, for max
-        max_df = df.rolling(window_str).apply(lambda x: f(x, 'max'), raw=False)
-        
-        diff_df = max_df - min_df
+        window_ns = int(window*1e6)*1000 # rounded to microseconds
+        min_df, argmin, max_df, argmax = _rolling_min_max(df.values, 
+                                                 df.index.asi8, window_ns)
+
+        diff = max_df - min_df
         if not absolute_value:
-            reverse_order = tmax_df < tmin_df 
-            diff_df[reverse_order] = -diff_df[reverse_order]
+            reverse_order = argmax < argmin
+            diff[reverse_order] = -diff[reverse_order]
+        diff_df = pd.DataFrame(diff, index=df.index, columns=df.columns)
 
         if absolute_value:
             error_prefix = '|Delta|'
@@ -517,60 +1329,67 @@ class PerformanceMonitoring(object):
             error_prefix = 'Delta'
         
         # Evaluate strings for bound values
-        for i in range(len(bound)):
-            if bound[i] in none_list:
-                bound[i] = None
-            elif type(bound[i]) is str:
-                bound[i] = self.evaluate_string('', bound[i], specs)
-        
-        def extract_exact_position(mask1, tmin_df, tmax_df):
-            mask2 = pd.DataFrame(False, columns=mask1.columns, index=mask1.index)
-            # Loop over t, col in mask1 where condition is True
-            for t,col in list(mask1[mask1 > 0].stack().index): 
-                # set the initially flaged location to False
-                mask2.loc[t,col] = False 
-                # extract the start and end time
-                start_time = tmin_df.loc[t,col]
-                end_time = tmax_df.loc[t,col]
-                # update mask2
-                if start_time < end_time:
-                    mask2.loc[start_time:end_time,col] = True # set the time between max and min to true
-                else:
-                    mask2.loc[end_time:start_time,col] = True # set the time between max and min to true
+        bound = self._evaluate_bound(bound, specs)
+        
+        def extract_exact_position(mask1):
+            # Flag the data points between the min and max of each window 
+            # that failed the test, intervals for all windows are stored 
+            # in one IntervalMask
+            row, col = np.nonzero(mask1)
+            start = np.minimum(argmin[row, col], argmax[row, col])
+            end = np.maximum(argmin[row, col], argmax[row, col])
+            mask2 = IntervalMask(df.index, df.columns, col, start, end+1)
+            if tfilter_rows is not None:
+                mask2 = mask2.filter_rows(tfilter_rows)
             return mask2
         
+        # Windows that end in data that was already tested are not checked, 
+        # but the exact position can include that data
+        untested_rows = self._untested_rows(df.index)
+        tfilter_rows = self._time_filter_rows(df.index)
+        
         # Lower Bound
         if bound[0] is not None:
-            mask = (diff_df < bound[0])
-            if not self.tfilter.empty:
-                mask[~self.tfilter] = False
-            if mask.sum(axis=1).sum(axis=0) > 0:
-                mask = extract_exact_position(mask, tmin_df, tmax_df)
-                self._append_test_results(mask, error_prefix+' < lower bound, '+str(bound[0]), 
-                                         min_failures=min_failures) 
+            mask = (diff_df < bound[0]).values
+            if untested_rows is not None:
+                mask = mask & untested_rows[:,np.newaxis]
+            if mask.any():
+                mask = extract_exact_position(mask)
+                self._store_blocks(mask.index, mask.columns, mask.col, 
+                        mask.start, mask.stop-1, 
+                        error_prefix+' < lower bound, '+str(bound[0]), 
+                        min_failures=min_failures) 
 
         # Upper Bound
         if bound[1] is not None:
-            mask = (diff_df > bound[1])
-            if not self.tfilter.empty:
-                mask[~self.tfilter] = False
-            if mask.sum(axis=1).sum(axis=0) > 0:
-                mask = extract_exact_position(mask, tmin_df, tmax_df)
-                self._append_test_results(mask, error_prefix+' > upper bound, '+str(bound[1]), 
-                                         min_failures=min_failures) 
+            mask = (diff_df > bound[1]).values
+            if untested_rows is not None:
+                mask = mask & untested_rows[:,np.newaxis]
+            if mask.any():
+                mask = extract_exact_position(mask)
+                self._store_blocks(mask.index, mask.columns, mask.col, 
+                        mask.start, mask.stop-1, 
+                        error_prefix+' > upper bound, '+str(bound[1]), 
+                        min_failures=min_failures) 
                 
     def check_outlier(self, bound, key=None, specs={}, window=3600, 
-                        absolute_value=True, rolling_mean=0, min_failures=1):
+                        absolute_value=True, rolling_mean=0, min_failures=1,
+                        robust=False):
         """
         Check bounds on normalized data within a moving window to find outliers.
         The bound is specified in standard deviations.
-        Data normalized using (data-mean)/std.
+        Data normalized using (data-mean)/std, or (data-median)/(1.4826*MAD) 
+        if robust = True, where MAD is the median absolute deviation.
 
         Parameters
         ----------
-        bound : list of floats
+        bound : list
             [lower bound, upper bound], None can be used in place of a lower 
-            or upper bound
+            or upper bound.  Each bound can be a float, a string (evaluated 
+            using evaluate_string), a dictionary of {column name or translation 
+            key: float} or a list of floats (one per column), a pandas Series 
+            indexed by column names (per column bounds) or by time (time-varying 
+            bound), or a pandas DataFrame aligned to the data
 
         key : string (optional)
             Translation dictionary key. If not specified, all columns are used 
@@ -594,22 +1413,56 @@ class PerformanceMonitoring(object):
         min_failures : int (optional)
             Minimum number of consecutive failures required for reporting, 
             default = 1
+
+        robust : boolean (optional)
+            Normalize data using the median and median absolute deviation, 
+            which are less sensitive to outliers and skewed data than the mean 
+            and standard deviation, default = False.  Within a moving window, 
+            MAD is the median absolute deviation from the median of the 
+            window.
         """
+        if self._run_in_chunks(key, self.check_outlier, bound, key, specs, window, 
+                               absolute_value, rolling_mean, min_failures, 
+                               robust):
+            return
+        
         logger.info("Check for outliers")
 
-        df = self._setup_data(key, rolling_mean)
+        df = self._setup_data(key, rolling_mean, lookback=window)
         if df is None:
             return
 
-        # Compute normalized data
+        # Compute the center (mean or median) and scale (std or MAD)
         if window is not None:
             window_str = str(int(window*1e6)) + 'us'
-            df = (df - df.rolling(window_str).mean())/df.rolling(window_str).std()
+            if robust:
+                center = self._rolling(df, window_str, 'median', rolling_mean)
+                scale = self._rolling(df, window_str, 'mad', rolling_mean)
+            else:
+                center = self._rolling(df, window_str, 'mean', rolling_mean)
+                scale = self._rolling(df, window_str, 'std', rolling_mean)
+            center = center.values
+            scale = scale.values
         else:
-            df = (df - df.mean())/df.std()
+            if robust:
+                center = df.median()
+                scale = np.abs(df - center).median()
+            else:
+                center = df.mean()
+                scale = df.std()
+            center = center.values
+            scale = scale.values
+        
+        # Compute normalized data in one array
+        values = np.subtract(df.values, center)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(values, scale, out=values)
+            if robust:
+                np.divide(values, 1.4826, out=values)
         if absolute_value:
-            df = np.abs(df)
-        df.replace([np.inf, -np.inf], np.nan, inplace=True)
+            np.abs(values, out=values)
+        values[np.isinf(values)] = np.nan
+        df = pd.DataFrame(values, index=df.index, columns=df.columns)
         
         if absolute_value:
             error_prefix = '|Outlier|'
@@ -634,6 +1487,9 @@ class PerformanceMonitoring(object):
             Minimum number of consecutive failures required for reporting, 
             default = 1
         """
+        if self._run_in_chunks(key, self.check_missing, key, min_failures):
+            return
+        
         logger.info("Check for missing data")
 
         df = self._setup_data(key, 0)
@@ -641,13 +1497,21 @@ class PerformanceMonitoring(object):
             return
         
         # Extract missing data
-        mask = pd.isnull(df) # checks for np.nan, np.inf
-
+        mask = IntervalMask.from_dataframe(pd.isnull(df)) # checks for np.nan, np.inf
+        
+        # Missing timestamps are not reported as missing data
         missing_timestamps = self.test_results[
                 self.test_results['Error Flag'] == 'Missing timestamp']
-        for index, row in missing_timestamps.iterrows():
-            mask.loc[row['Start Time']:row['End Time']] = False
-
+        if missing_timestamps.shape[0] > 0:
+            start = []
+            stop = []
+            for index, row in missing_timestamps.iterrows():
+                rows = df.index.slice_locs(row['Start Time'], row['End Time'])
+                start.append(rows[0])
+                stop.append(rows[1])
+            mask = mask & ~IntervalMask.from_rows(df.index, df.columns, 
+                                                  start, stop)
+        
         self._append_test_results(mask, 'Missing data', min_failures=min_failures)
 
     def check_corrupt(self, corrupt_values, key=None, min_failures=1):
@@ -667,6 +1531,10 @@ class PerformanceMonitoring(object):
             Minimum number of consecutive failures required for reporting, 
             default = 1
         """
+        if self._run_in_chunks(key, self.check_corrupt, corrupt_values, key, 
+                               min_failures):
+            return
+        
         logger.info("Check for corrupt data")
 
         df = self._setup_data(key, 0)
@@ -677,7 +1545,13 @@ class PerformanceMonitoring(object):
         mask = pd.DataFrame(data = np.zeros(df.shape), index = df.index, columns = df.columns, dtype = bool) # all False
         for i in corrupt_values:
             mask = mask | (df == i)
-        self.df[mask] = np.nan
+        if self._chunk_columns is None:
+            self.df[mask] = np.nan
+        else:
+            # Only modify columns in the chunk
+            for col in mask.columns[mask.values.any(axis=0)]:
+                self.df.loc[mask[col].values, col] = np.nan
+        self._rolling_cache = {}
                
         self._append_test_results(mask, 'Corrupt data', min_failures=min_failures)
 
@@ -687,6 +1561,8 @@ class PerformanceMonitoring(object):
         For each {keyword} in string_to_eval,
         {keyword} is first expanded to self.df[self.trans[keyword]],
         if that fails, then {keyword} is expanded to specs[keyword].
+        The string is parsed and compiled once, repeat evaluations of the 
+        same string use the cached compiled expression.
 
         Parameters
         ----------
@@ -704,31 +1580,30 @@ class PerformanceMonitoring(object):
         pandas DataFrame or pandas Series with the evaluated string
         """
 
-        match = re.findall(r"\{(.*?)\}", string_to_eval)
-        for m in set(match):
-            m = m.replace('[','') # check for list
-
+        # Resolve keywords, each keyword is bound to a local variable in the 
+        # compiled expression
+        values = {}
+        for m in _expression_keywords(string_to_eval):
             if m == 'ELAPSED_TIME':
-                ELAPSED_TIME = self.get_elapsed_time()
-                string_to_eval = string_to_eval.replace("{"+m+"}",m)
+                values[m] = self.get_elapsed_time()
             elif m == 'CLOCK_TIME':
-                CLOCK_TIME = self.get_clock_time()
-                string_to_eval = string_to_eval.replace("{"+m+"}",m)
+                values[m] = self.get_clock_time()
             else:
                 try:
-                    self.df[self.trans[m]]
-                    datastr = "self.df[self.trans['" + m + "']]"
-                    string_to_eval = string_to_eval.replace("{"+m+"}",datastr)
+                    values[m] = self.df[self.trans[m]]
                 except:
                     try:
-                        specs[m]
-                        datastr = "specs['" + m + "']"
-                        string_to_eval = string_to_eval.replace("{"+m+"}",datastr)
+                        values[m] = specs[m]
                     except:
                         pass
 
         try:
-            signal = eval(string_to_eval)
+            code, names = _compile_expression(string_to_eval, 
+                                              tuple(sorted(values.keys())))
+            local_vars = {'self': self, 'specs': specs}
+            for m, value in values.items():
+                local_vars[names[m]] = value
+            signal = eval(code, globals(), local_vars)
             if type(signal) is tuple: # A tuple of series
                 col_name = [col_name + " " + str(i+1)  for i in range(len(signal))]
                 signal = pd.concat(signal, axis=1)
@@ -749,6 +1624,25 @@ class PerformanceMonitoring(object):
 
         return signal
 
+    def _missing_intervals(self, df):
+        """
+        Return an IntervalMask which is True for missing data in df, 
+        computed in column chunks if chunk_size is defined.
+        """
+        if self.chunk_size is None or df.shape[1] <= self.chunk_size:
+            return IntervalMask.from_dataframe(pd.isnull(df))
+        
+        size = max(int(self.chunk_size), 1)
+        col, start, stop = [], [], []
+        for i in range(0, df.shape[1], size):
+            mask = IntervalMask.from_dataframe(pd.isnull(df.iloc[:, i:i+size]))
+            col.append(mask.col + i)
+            start.append(mask.start)
+            stop.append(mask.stop)
+        
+        return IntervalMask(df.index, df.columns, np.concatenate(col), 
+                            np.concatenate(start), np.concatenate(stop))
+    
     def get_elapsed_time(self):
         """
         Returns the elapsed time in seconds for each Timestamp in the 
@@ -781,7 +1675,7 @@ class PerformanceMonitoring(object):
 
         return clock_time
 
-    def get_test_results_mask(self, key=None):
+    def get_test_results_mask(self, key=None, intervals=False):
         """
         Return a mask of data-times that failed a quality control test.
 
@@ -790,11 +1684,17 @@ class PerformanceMonitoring(object):
         key : string (optional)
             Translation dictionary key. If not specified, all columns are used
 
+        intervals : boolean (optional)
+            Flag indicating if the mask is returned as an IntervalMask, which 
+            stores intervals instead of a value for each data point, 
+            default = False.  Use IntervalMask.to_dataframe to convert the 
+            mask to a DataFrame.
+
         Returns
         --------
-        pandas DataFrame containing boolean values for each data point, True =
-        data point pass all tests, False = data point did not pass at least 
-        one test (or data is NaN).
+        pandas DataFrame (or IntervalMask) containing boolean values for each 
+        data point, True = data point pass all tests, False = data point did 
+        not pass at least one test (or data is NaN).
         """
         if self.df.empty:
             logger.info("Empty database")
@@ -808,16 +1708,360 @@ class PerformanceMonitoring(object):
                 return
         else:
             df = self.df
-
-        test_results_mask = ~pd.isnull(df) # False if NaN
-        for i in self.test_results.index:
-            variable = self.test_results.loc[i, 'Variable Name']
-            start_date = self.test_results.loc[i, 'Start Time']
-            end_date = self.test_results.loc[i, 'End Time']
-            if variable in test_results_mask.columns:
+        
+        if intervals:
+            # False if NaN, missing data is extracted in column chunks
+            passed = ~self._missing_intervals(df)
+        else:
+            test_results_mask = ~pd.isnull(df) # False if NaN
+        
+        test_results = self.test_results[
+                self.test_results['Variable Name'].isin(df.columns)]
+        if test_results.shape[0] == 0:
+            if intervals:
+                return passed
+            return test_results_mask
+        
+        # Convert start and end times to integer positions and flag all 
+        # intervals at once.  If the times can't be compared to the index 
+        # (or the index is not sorted), intervals are flagged one at a time
+        try:
+            if not df.index.is_monotonic_increasing:
+                raise ValueError("index must be monotonic")
+            start_time = pecos.utils.to_index_time(
+                    test_results['Start Time'], df.index)
+            end_time = pecos.utils.to_index_time(
+                    test_results['End Time'], df.index)
+        except (TypeError, ValueError) as e:
+            logger.debug("Test results flagged one at a time: %s", e)
+            test_results_mask = ~pd.isnull(df)
+            for i in test_results.index:
+                variable = test_results.loc[i, 'Variable Name']
+                start_date = test_results.loc[i, 'Start Time']
+                end_date = test_results.loc[i, 'End Time']
                 try:
                     test_results_mask.loc[start_date:end_date,variable] = False
                 except:
                     pass
+            if intervals:
+                return IntervalMask.from_dataframe(test_results_mask)
+            return test_results_mask
+        
+        valid = ~(start_time.isnull() | end_time.isnull())
+        col = df.columns.get_indexer(test_results['Variable Name'])[valid]
+        start = df.index.asi8.searchsorted(start_time.asi8[valid], side='left')
+        stop = df.index.asi8.searchsorted(end_time.asi8[valid], side='right')
+        
+        if intervals:
+            return passed & ~IntervalMask(df.index, df.columns, col, start, stop)
+        
+        failed = pecos.utils.intervals_to_mask(start, stop, col, df.shape)
+        test_results_mask[failed] = False
                 
         return test_results_mask
+
+def _expression_keywords(string_to_eval):
+    """
+    Return the list of {keywords} in string_to_eval, cached.
+    """
+    try:
+        return _keyword_cache[string_to_eval]
+    except KeyError:
+        pass
+    
+    keywords = []
+    for m in re.findall(r"\{(.*?)\}", string_to_eval):
+        m = m.replace('[','') # check for list
+        if m not in keywords:
+            keywords.append(m)
+    
+    if len(_keyword_cache) >= _expression_cache_size:
+        _keyword_cache.clear()
+    _keyword_cache[string_to_eval] = keywords
+    
+    return keywords
+
+def _compile_expression(string_to_eval, keywords):
+    """
+    Compile string_to_eval, each {keyword} in keywords is replaced by a 
+    local variable name.  Returns the code object and a dictionary of 
+    local variable names (keyed by keyword), cached.
+    """
+    key = (string_to_eval, keywords)
+    try:
+        return _expression_cache[key]
+    except KeyError:
+        pass
+    
+    names = {}
+    for i, m in enumerate(keywords):
+        if m in ['ELAPSED_TIME', 'CLOCK_TIME']:
+            names[m] = m
+        else:
+            names[m] = '_keyword' + str(i)
+        string_to_eval = string_to_eval.replace("{"+m+"}", names[m])
+    code = compile(string_to_eval, '<string>', 'eval')
+    
+    if len(_expression_cache) >= _expression_cache_size:
+        _expression_cache.clear()
+    _expression_cache[key] = (code, names)
+    
+    return code, names
+
+def _find_blocks(code):
+    """
+    Find blocks of consecutive failures in each row of a 2D array (columns 
+    x time), where failures are nonzero values and a block is a run of 
+    equal values.  Returns the row (column in the data), start position 
+    and stop position of each block, ordered by row and then by position.
+    """
+    failed = code != 0
+    start = failed.copy()
+    start[:,1:] &= (code[:,1:] != code[:,:-1])
+    stop = failed.copy()
+    stop[:,:-1] &= (code[:,:-1] != code[:,1:])
+    
+    start_col_idx, start_row_idx = np.where(start)
+    stop_row_idx = np.where(stop)[1]
+    
+    return start_col_idx, start_row_idx, stop_row_idx
+
+def _bound_name(bound):
+    """
+    Return the name of a time-varying bound used in error flags, the 
+    original string if the bound was evaluated from a string.
+    """
+    if type(bound) is str:
+        return bound
+    return 'time series'
+
+def _rolling_min_max(values, time, window):
+    """
+    Compute the min and max, and the position of each, within a time based 
+    rolling window.  The window for time t includes data in (t-window, t], 
+    which is consistent with pandas time based rolling windows.
+
+    Windows are covered by two (possibly overlapping) blocks whose size is a 
+    power of two.  The position of the min/max in each block is built up 
+    by doubling the block size, and queries are answered at the level that 
+    matches their window length, which results in O(n log(w)) vectorized 
+    operations per column (where w is the number of points in a window).
+    Ties are resolved using the first occurrence, consistent with idxmin 
+    and idxmax.  Windows with fewer than two non-null values are set to NaN.
+
+    Parameters
+    ----------
+    values : numpy ndarray
+        2D array of data, one column per signal
+
+    time : numpy ndarray
+        Monotonic time index, in ns
+
+    window : int
+        Size of the moving window, in ns
+
+    Returns
+    -------
+    min, argmin, max, argmax : numpy ndarrays
+        Min and max values (float) and the position of each (int)
+    """
+    values = np.asarray(values, dtype=float)
+    n, m = values.shape
+    
+    isnull = np.isnan(values)
+    min_values = np.where(isnull, np.inf, values)
+    max_values = np.where(isnull, -np.inf, values)
+    
+    # Start of each window and number of points in each window
+    end = np.arange(n)
+    start = np.searchsorted(time, time - window, side='right')
+    length = end - start + 1
+    level = np.floor(np.log2(np.maximum(length, 1))).astype(int)
+    
+    # Count of non-null values in each window
+    count = np.vstack((np.zeros((1,m), dtype=int), 
+                       np.cumsum(~isnull, axis=0)))
+    count = count[end+1] - count[start]
+    
+    cols = np.arange(m)
+    argmin = np.zeros((n, m), dtype=int)
+    argmax = np.zeros((n, m), dtype=int)
+    
+    # Position of the min/max in blocks [p, p+2^k), for level k
+    block_argmin = np.repeat(end[:,None], m, axis=1)
+    block_argmax = block_argmin.copy()
+    for k in range(level.max()+1 if n > 0 else 0):
+        size = 2**k
+        if k > 0:
+            num = n - size + 1
+            half = size//2
+            a = block_argmin[:num]
+            b = block_argmin[half:half+num]
+            block_argmin = np.where(min_values[a, cols] <= min_values[b, cols], a, b)
+            a = block_argmax[:num]
+            b = block_argmax[half:half+num]
+            block_argmax = np.where(max_values[a, cols] >= max_values[b, cols], a, b)
+        
+        # Answer the windows that are covered by blocks of this size
+        rows = np.where(level == k)[0]
+        if len(rows) == 0:
+            continue
+        left = start[rows]
+        right = end[rows] - size + 1
+        a = block_argmin[left]
+        b = block_argmin[right]
+        argmin[rows] = np.where(min_values[a, cols] <= min_values[b, cols], a, b)
+        a = block_argmax[left]
+        b = block_argmax[right]
+        argmax[rows] = np.where(max_values[a, cols] >= max_values[b, cols], a, b)
+    
+    min_values = values[argmin, cols]
+    max_values = values[argmax, cols]
+    min_values[count < 2] = np.nan
+    max_values[count < 2] = np.nan
+    
+    return min_values, argmin, max_values, argmax
+
+def _wavelet_matrix(ranks, nbits):
+    """
+    Build a wavelet matrix of ranks (non-negative integers < 2**nbits).  
+    Each level stores the cumulative count of zero bits, from the most 
+    significant bit down, and the ranks are stably sorted by that bit 
+    before moving to the next level.
+    """
+    levels = []
+    for level in range(nbits-1, -1, -1):
+        bits = (ranks >> level) & 1
+        zeros = np.zeros(len(ranks)+1, dtype=ranks.dtype)
+        np.cumsum(1 - bits, out=zeros[1:])
+        levels.append((level, zeros, zeros[-1]))
+        ranks = np.concatenate((ranks[bits == 0], ranks[bits == 1]))
+    
+    return levels
+
+def _kth_smallest(levels, left, right, k):
+    """
+    Return the k-th smallest rank (0 based) in positions [left, right) 
+    using a wavelet matrix, vectorized over arrays of left, right and k.
+    """
+    result = np.zeros_like(k)
+    for level, zeros, num_zeros in levels:
+        zeros_left = zeros[left]
+        zeros_right = zeros[right]
+        num = zeros_right - zeros_left
+        one = (k >= num).astype(k.dtype)
+        k = k - one*num
+        left = zeros_left + one*(num_zeros + left - 2*zeros_left)
+        right = zeros_right + one*(num_zeros + right - 2*zeros_right)
+        result |= one << level
+    
+    return result
+
+def _rolling_median_mad(values, time, window):
+    """
+    Compute the median and the median absolute deviation (MAD) from the 
+    median of each time based rolling window.  The window for time t 
+    includes data in (t-window, t], which is consistent with pandas time 
+    based rolling windows.  NaN values are ignored.
+
+    The ranks of each column are stored in a wavelet matrix, which returns 
+    the k-th smallest value of every window in O(log(n)) vectorized 
+    operations.  The deviations below and above the median of a window 
+    form two sorted sequences, the MAD is selected from the two using a 
+    binary search on the number of values taken from the lower sequence, 
+    which results in O(n log(n) log(w)) vectorized operations per column 
+    (where w is the number of points in a window).
+
+    Parameters
+    ----------
+    values : numpy ndarray
+        2D array of data, one column per signal
+
+    time : numpy ndarray
+        Monotonic time index, in ns
+
+    window : int
+        Size of the moving window, in ns
+
+    Returns
+    -------
+    median, mad : numpy ndarrays
+        Median and MAD of each window, NaN if the window has no 
+        non-null values
+    """
+    values = np.asarray(values, dtype=float)
+    n, m = values.shape
+    
+    median = np.full((n, m), np.nan)
+    mad = np.full((n, m), np.nan)
+    
+    # Start and end (exclusive) of each window
+    end = np.arange(1, n+1)
+    start = np.searchsorted(time, time - window, side='right')
+    
+    for j in range(m):
+        x = values[:,j]
+        notnull = ~np.isnan(x)
+        num_values = int(notnull.sum())
+        
+        # Ranks of each value, null values are ranked last (and are never 
+        # selected since k is less than the count of non-null values)
+        order = np.argsort(np.where(notnull, x, np.inf), kind='mergesort')
+        sorted_values = x[order[:num_values]]
+        ranks = np.empty(n, dtype=int)
+        ranks[order] = np.minimum(np.arange(n), num_values)
+        levels = _wavelet_matrix(ranks, max(num_values.bit_length(), 1))
+        
+        # Count of non-null values in each window
+        count = np.concatenate(([0], np.cumsum(notnull)))
+        count = count[end] - count[start]
+        rows = np.where(count > 0)[0]
+        count = count[rows]
+        left = np.tile(start[rows], 2)
+        right = np.tile(end[rows], 2)
+        
+        def kth_smallest(k1, k2):
+            # k-th smallest values of each window for two sets of k
+            k = np.clip(np.concatenate((k1, k2)), 0, np.tile(count-1, 2))
+            kth = sorted_values[_kth_smallest(levels, left, right, k)]
+            return kth[:len(rows)], kth[len(rows):]
+        
+        # Median
+        lower, upper = kth_smallest((count-1)//2, count//2)
+        center = (lower + upper)/2
+        
+        # Values below the median (in sorted order, positions < p) give 
+        # the deviations center - sorted[p-1-t], values above the median 
+        # give the deviations sorted[p+t] - center, t = 0, 1, ...  Find 
+        # the number of lower deviations (a) in the k+1 smallest deviations.
+        p = count//2
+        q = count - p
+        k = (count-1)//2
+        lo = np.maximum(0, k+1-q)
+        hi = np.minimum(k+1, p)
+        while True:
+            active = lo < hi
+            if not active.any():
+                break
+            mid = (lo + hi + 1)//2
+            lower, upper = kth_smallest(p-mid, p+k+1-mid)
+            valid = (center - lower <= upper - center) | (k+1-mid >= q)
+            lo = np.where(active & valid, mid, lo)
+            hi = np.where(active & ~valid, mid-1, hi)
+        a = lo
+        
+        # The k-th smallest deviation is the largest of the k+1 smallest 
+        # deviations, the next smallest deviation is used when the count 
+        # is even
+        lower, upper = kth_smallest(p-a, p+k-a)
+        kth = np.maximum(np.where(a > 0, center - lower, -np.inf), 
+                         np.where(k >= a, upper - center, -np.inf))
+        lower, upper = kth_smallest(p-1-a, p+k+1-a)
+        next_kth = np.minimum(np.where(a < p, center - lower, np.inf), 
+                              np.where(k+1-a < q, upper - center, np.inf))
+        next_kth = np.where(count % 2 == 1, kth, next_kth)
+        
+        median[rows, j] = center
+        mad[rows, j] = (kth + next_kth)/2
+    
+    return median, mad
@@ -0,0 +1,315 @@
+"""
+The pipeline module contains functions to compile a configuration dictionary
+into an execution plan and run the plan.
+"""
+import os
+import sys
+import argparse
+import logging
+from multiprocessing.pool import ThreadPool
+from pecos.monitoring import PerformanceMonitoring
+import pecos.metrics
+import pecos.io
+import pecos.graphics
+
+try:
+    import yaml
+except:
+    pass
+
+logger = logging.getLogger(__name__)
+
+_check_methods = [('Range Bounds', 'check_range'),
+                  ('Increment Bounds', 'check_increment'),
+                  ('Delta Bounds', 'check_delta'),
+                  ('Outlier Bounds', 'check_outlier')]
+
+_check_options = {'Bound': 'bound',
+                  'Rolling Mean': 'rolling_mean',
+                  'Min Failures': 'min_failures',
+                  'Increment': 'increment',
+                  'Window': 'window',
+                  'Absolute Value': 'absolute_value',
+                  'Robust': 'robust'}
+
+def compile_config(config):
+    """
+    Compile a configuration dictionary into an execution plan.
+    The following keys are used, if defined:
+
+    - Specifications: dictionary of constants, 'Frequency' is used to
+      check the timestamp
+    - Translation: translation dictionary
+    - Time Filter: string of Python code
+    - Corrupt Values: list of corrupt values
+    - Composite Signals: list of {name: string of Python code}
+    - QCI Exclude: list of keys (or column names) that are not counted in 
+      the quality control index, see qci
+    - Range Bounds, Increment Bounds, Delta Bounds, Outlier Bounds:
+      dictionary of {key: [lower bound, upper bound]} or
+      {key: {option: value}}, where options include 'Bound', 'Rolling Mean',
+      'Min Failures', 'Increment' (increment test), 'Window' (delta and
+      outlier tests), 'Absolute Value', and 'Robust' (outlier test)
+
+    Missing data is checked for all columns.
+
+    The plan contains setup steps, which are run in order (timestamp test,
+    time filter, missing and corrupt data tests, and composite signals),
+    rolling means, which are computed once for each key and window,
+    and range, increment, delta, and outlier tests, which are independent
+    of each other and can run concurrently.
+
+    Parameters
+    ----------
+    config : dictionary
+        Configuration
+
+    Returns
+    -------
+    Execution plan, dictionary with keys 'specs', 'translation', 'setup',
+    'rolling means' and 'checks'
+    """
+    specs = config.get('Specifications', {}) or {}
+
+    setup = []
+    if 'Frequency' in specs:
+        setup.append(('check_timestamp', specs['Frequency']))
+    if 'Time Filter' in config:
+        setup.append(('time_filter', config['Time Filter']))
+    setup.append(('check_missing', None))
+    if 'Corrupt Values' in config:
+        setup.append(('check_corrupt', config['Corrupt Values']))
+    for composite_signal in config.get('Composite Signals', []) or []:
+        for key, value in composite_signal.items():
+            setup.append(('composite_signal', (key, value)))
+
+    checks = []
+    rolling_means = []
+    for config_key, method in _check_methods:
+        for key, value in (config.get(config_key, {}) or {}).items():
+            if isinstance(value, dict):
+                kwds = {}
+                for option, option_value in value.items():
+                    if option not in _check_options:
+                        raise ValueError("Undefined option for " + config_key +
+                                         ", " + key + ": " + option)
+                    kwds[_check_options[option]] = option_value
+            else:
+                kwds = {'bound': value}
+            if 'bound' not in kwds:
+                raise ValueError("Bound is not defined for " + config_key +
+                                 ", " + key)
+            kwds['bound'] = list(kwds['bound'])
+            kwds['specs'] = specs
+
+            rolling_mean = kwds.get('rolling_mean', 0)
+            if rolling_mean > 0 and (key, rolling_mean) not in rolling_means:
+                rolling_means.append((key, rolling_mean))
+
+            checks.append((method, key, kwds))
+
+    plan = {'specs': specs,
+            'translation': config.get('Translation', {}) or {},
+            'setup': setup,
+            'rolling means': rolling_means,
+            'checks': checks}
+
+    return plan
+
+def run_plan(plan, df, threads=None):
+    """
+    Run an execution plan.
+
+    Parameters
+    ----------
+    plan : dictionary
+        Execution plan, returned from compile_config
+
+    df : pandas DataFrame
+        Data
+
+    threads : int (optional)
+        Number of threads used to compute rolling means and run tests,
+        default = None (number of CPUs).  If threads = 1, tests are run in
+        the current thread.  Test results are the same for any number
+        of threads.
+
+    Returns
+    -------
+    PerformanceMonitoring object
+    """
+    specs = plan['specs']
+
+    pm = PerformanceMonitoring()
+    pm.add_dataframe(df)
+    pm.add_translation_dictionary(plan['translation'])
+
+    for step, value in plan['setup']:
+        if step == 'check_timestamp':
+            pm.check_timestamp(value)
+        elif step == 'time_filter':
+            time_filter = pm.evaluate_string('Time Filter', value, specs)
+            pm.add_time_filter(time_filter)
+        elif step == 'check_missing':
+            pm.check_missing()
+        elif step == 'check_corrupt':
+            pm.check_corrupt(value)
+        elif step == 'composite_signal':
+            signal = pm.evaluate_string(value[0], value[1], specs)
+            pm.add_dataframe(signal)
+            pm.add_translation_dictionary({value[0]: list(signal.columns)})
+
+    # Rolling means are stored in the rolling mean cache
+    def compute_rolling_mean(rolling_mean):
+        pm._setup_data(rolling_mean[0], rolling_mean[1])
+
+    def run_check(check):
+        method, key, kwds = check
+        kwds = dict(kwds)
+        kwds['bound'] = list(kwds['bound'])
+        view = _CheckView(pm)
+        getattr(view, method)(key=key, **kwds)
+        return view._test_results
+
+    if threads == 1:
+        list(map(compute_rolling_mean, plan['rolling means']))
+        test_results = list(map(run_check, plan['checks']))
+    else:
+        pool = ThreadPool(threads)
+        try:
+            pool.map(compute_rolling_mean, plan['rolling means'])
+            test_results = pool.map(run_check, plan['checks'])
+        finally:
+            pool.close()
+            pool.join()
+
+    # Test results are added in plan order
+    for results in test_results:
+        if len(results) > 0:
+            pm._test_results.append_dataframe(results.to_dataframe())
+
+    return pm
+
+def run_pipeline(config, df, threads=None):
+    """
+    Compile a configuration dictionary into an execution plan and run the
+    plan, see compile_config and run_plan for more details.
+
+    Parameters
+    ----------
+    config : dictionary or string
+        Configuration, or configuration file name (yml format)
+
+    df : pandas DataFrame
+        Data
+
+    threads : int (optional)
+        Number of threads used to compute rolling means and run tests,
+        default = None (number of CPUs)
+
+    Returns
+    -------
+    PerformanceMonitoring object
+    """
+    if isinstance(config, str):
+        with open(config, 'r') as fid:
+            config = yaml.safe_load(fid)
+
+    plan = compile_config(config)
+
+    return run_plan(plan, df, threads)
+
+def main(args=None):
+    """
+    Run the pipeline from the command line, for example::
+
+        pecos-pipeline config.yml data.dat --results-directory Results
+
+    Data files are read using io.read_data_file.  Test results, the quality 
+    control index (see qci), and the monitoring report are saved to the 
+    results directory.
+    """
+    parser = argparse.ArgumentParser(prog='pecos-pipeline',
+                description='Run quality control analysis defined in a configuration file.')
+    parser.add_argument('config', help='configuration file name (yml format)')
+    parser.add_argument('data', help='data file name')
+    parser.add_argument('--results-directory', default='Results',
+                        help='results directory, default = Results')
+    parser.add_argument('--system-name', default=None,
+                        help='system name, default = data file name')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='number of threads, default = number of CPUs')
+    args = parser.parse_args(args)
+
+    with open(args.config, 'r') as fid:
+        config = yaml.safe_load(fid)
+
+    df = pecos.io.read_data_file(args.data)
+    system_name = args.system_name
+    if system_name is None:
+        system_name = os.path.splitext(os.path.basename(args.data))[0]
+
+    pm = run_pipeline(config, df, args.threads)
+
+    QCI = qci(pm, config)
+
+    results_directory = args.results_directory
+    if not os.path.exists(results_directory):
+        os.makedirs(results_directory)
+    graphics_file_rootname = os.path.join(results_directory, 'test_results')
+    metrics_file = os.path.join(results_directory, system_name + '_metrics.csv')
+    test_results_file = os.path.join(results_directory, system_name + '_test_results.csv')
+    report_file = os.path.join(results_directory, system_name + '.html')
+
+    pecos.graphics._use_agg_backend()
+    test_results_graphics = pecos.graphics.plot_test_results(graphics_file_rootname, pm)
+    pecos.io.write_metrics(metrics_file, QCI)
+    pecos.io.write_test_results(test_results_file, pm.test_results)
+    pecos.io.write_monitoring_report(report_file, pm, test_results_graphics, [],
+                                     QCI, config=config)
+
+    return 0
+
+def qci(pm, config):
+    """
+    Compute the quality control index using test results from the pipeline.
+    Columns of the keys listed in 'QCI Exclude' in the configuration (for 
+    example, composite signals that model the expected data) are not 
+    counted.
+
+    Parameters
+    ----------
+    pm : PerformanceMonitoring object
+        Returned from run_pipeline
+
+    config : dictionary
+        Configuration
+
+    Returns
+    -------
+    pandas DataFrame with quality control index
+    """
+    mask = pm.get_test_results_mask()
+    for key in config.get('QCI Exclude', []) or []:
+        columns = pm.trans.get(key, [key])
+        mask = mask.drop([col for col in columns if col in mask.columns], 
+                         axis=1)
+
+    return pecos.metrics.qci(mask, pm.tfilter)
+
+class _CheckView(PerformanceMonitoring):
+
+    def __init__(self, pm):
+        """
+        PerformanceMonitoring object that shares data, the translation
+        dictionary, time filter and rolling mean cache with pm, and stores 
+        test results separately, so tests can run concurrently.
+        """
+        PerformanceMonitoring.__init__(self)
+        self.df = pm.df
+        self.trans = pm.trans
+        self.tfilter = pm.tfilter
+        self._rolling_cache = pm._rolling_cache
+
+if __name__ == '__main__':
+    sys.exit(main())
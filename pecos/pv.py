@@ -7,7 +7,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def insolation(G, tfilter=None, per_day=True):
+def insolation(G, tfilter=None, per_day=True, period=None):
     """
     Compute insolation defined as:
     
@@ -30,6 +30,10 @@ def insolation(G, tfilter=None, per_day=True):
     per_day : boolean (optional)
         Flag indicating if the results should be computed per day, default = True
     
+    period : string (optional)
+        Pandas offset alias (i.e. '15min', 'H', 'D', 'W', 'MS') used to compute 
+        results per period, overrides per_day, default = None
+        
     Returns
     -------
     Insolation in a pandas DataFrame
@@ -37,11 +41,11 @@ def insolation(G, tfilter=None, per_day=True):
     if type(G) is pd.core.series.Series:
         G = G.to_frame('Irradiance')
         
-    H = time_integral(G,  tfilter=tfilter, per_day=per_day)
+    H = time_integral(G,  tfilter=tfilter, per_day=per_day, period=period)
     
     return H
     
-def energy(P, tfilter=None, per_day=True):
+def energy(P, tfilter=None, per_day=True, period=None):
     """
     Convert energy defined as:
     
@@ -64,6 +68,10 @@ def energy(P, tfilter=None, per_day=True):
     per_day : boolean (optional)
         Flag indicating if the results should be computed per day, default = True
     
+    period : string (optional)
+        Pandas offset alias (i.e. '15min', 'H', 'D', 'W', 'MS') used to compute 
+        results per period, overrides per_day, default = None
+        
     Returns
     -------
     Energy in a pandas DataFrame 
@@ -71,7 +79,7 @@ def energy(P, tfilter=None, per_day=True):
     if type(P) is pd.core.series.Series:
         P = P.to_frame('Power')
         
-    E = time_integral(P, tfilter=tfilter, per_day=per_day)
+    E = time_integral(P, tfilter=tfilter, per_day=per_day, period=period)
     
     return E
 
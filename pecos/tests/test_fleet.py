@@ -0,0 +1,106 @@
+from nose.tools import *
+from os.path import abspath, dirname, join, isfile, isdir
+import pecos
+import pandas as pd
+import numpy as np
+import shutil
+import tempfile
+import time
+import os
+
+testdir = dirname(abspath(__file__))
+
+config = {'Specifications': {'Frequency': 3600, 'Max': 0.9},
+          'Translation': {'Random': ['A', 'B', 'C']},
+          'Time Filter': "({CLOCK_TIME} > 3*3600) & ({CLOCK_TIME} < 21*3600)",
+          'Range Bounds': {'Random': [-0.9, 'Max']}}
+
+def generate_data():
+    np.random.seed(500)
+    index = pd.date_range('1/1/2017', periods=24, freq='H')
+    data = np.sin(np.random.rand(3,1)*np.arange(0,24,1))
+    return pd.DataFrame(data=data.transpose(), index=index, columns=['A', 'B', 'C'])
+
+def generate_data_slowly():
+    time.sleep(60)
+    return generate_data()
+
+def generate_data_and_exit():
+    os._exit(1)
+
+def test_run_fleet():
+    results_directory = abspath(join(testdir, 'test_run_fleet'))
+    if isdir(results_directory):
+        shutil.rmtree(results_directory)
+
+    systems = [(('system1', 'location1'), config, generate_data()),
+               (('system2', 'location1'), config, generate_data),
+               (('system1', 'location2'), config, 'missing_file.dat')]
+
+    results = pecos.fleet.run_fleet(systems, results_directory=results_directory,
+                                    processes=2)
+
+    assert_equal(set(results.keys()), set([system[0] for system in systems]))
+    assert_equal(results[('system1', 'location1')]['status'], 'Success')
+    assert_equal(results[('system2', 'location1')]['status'], 'Success')
+    assert_equal(results[('system1', 'location2')]['status'], 'Failed')
+    assert_true('missing_file.dat' in results[('system1', 'location2')]['error'])
+    for result in results.values():
+        assert_true(result['run time'] >= 0)
+
+    # Same results for each system, in one process
+    serial_results = pecos.fleet.run_fleet(systems[0:2], processes=1)
+    for system in systems[0:2]:
+        result = results[system[0]]
+        assert_true(isfile(result['report']))
+        assert_true(len(result['graphics']) > 0)
+        assert_equal(serial_results[system[0]]['report'], None)
+        assert_true(result['metrics'].equals(serial_results[system[0]]['metrics']))
+        assert_equal(result['test results'].shape[0],
+                     serial_results[system[0]]['test results'].shape[0])
+
+    content = pecos.fleet.dashboard_content(results)
+    assert_true(content[('system1', 'location2')]['text'].startswith('Analysis failed'))
+    assert_true('Link to Report' in content[('system1', 'location1')]['link'])
+
+    content[('system2', 'location2')] = {}
+    filename = join(results_directory, 'dashboard.html')
+    pecos.io.write_dashboard(filename, ['location1', 'location2'],
+                             ['system1', 'system2'], content)
+    assert_true(isfile(filename))
+
+def test_run_fleet_data_file():
+    directory = tempfile.mkdtemp()
+    try:
+        file_name = join(directory, 'test_run_fleet_data_file.csv')
+        generate_data().to_csv(file_name)
+        
+        systems = [('system1', config, generate_data()), 
+                   ('system2', config, file_name)]
+        results = pecos.fleet.run_fleet(systems, processes=1)
+        assert_equal(results['system2']['status'], 'Success')
+        assert_true(results['system1']['metrics'].equals(results['system2']['metrics']))
+        assert_equal(os.listdir(directory), ['test_run_fleet_data_file.csv'])
+        
+        # Data files are cached in cache_dir
+        cache_dir = join(directory, 'cache')
+        results = pecos.fleet.run_fleet(systems, processes=1, cache_dir=cache_dir)
+        assert_equal(results['system2']['status'], 'Success')
+        assert_true(results['system1']['metrics'].equals(results['system2']['metrics']))
+        assert_equal(len(os.listdir(cache_dir)), 1)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True) # memory-mapped files can't be removed on Windows
+
+def test_run_fleet_timeout():
+    systems = [('system1', config, generate_data), 
+               ('system2', config, generate_data_slowly),
+               ('system3', config, generate_data_and_exit)]
+    
+    start_time = time.time()
+    results = pecos.fleet.run_fleet(systems, processes=3, timeout=5)
+    
+    assert_true(time.time() - start_time < 30)
+    assert_equal(results['system1']['status'], 'Success')
+    for system_name in ['system2', 'system3']:
+        assert_equal(results[system_name]['status'], 'Failed')
+        assert_true('timed out' in results[system_name]['error'])
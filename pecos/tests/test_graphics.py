@@ -5,6 +5,8 @@ import pecos
 import pandas as pd
 import numpy as np
 import inspect
+import time
+from multiprocessing.pool import ThreadPool
 import matplotlib.pylab as plt
 
 testdir = dirname(abspath(inspect.getfile(inspect.currentframe())))
@@ -92,6 +94,43 @@ def test_plot_timeseries2():
     
     assert_true(isfile(filename))
 
+def test_plot_timeseries3_downsample():
+    filename = abspath(join(testdir, 'plot_timeseries3.png'))
+    if isfile(filename):
+        os.remove(filename)
+        
+    periods = 10000
+    index = pd.date_range('1/1/2016', periods=periods, freq='min')
+    data = pd.Series(np.random.rand(periods), index=index, name='A')
+    test_results_group = pd.DataFrame({'Variable Name': ['A'], 
+        'Start Time': [index[10]], 'End Time': [index[20]], 'Timesteps': [11],
+        'Error Flag': ['Data > upper bound, 0.5']})
+    
+    plt.figure()
+    pecos.graphics.plot_timeseries(data, test_results_group=test_results_group, 
+                                   downsample=100)
+    plt.savefig(filename, format='png')
+    plt.close()
+    
+    assert_true(isfile(filename))
+    
+def test_downsample_mask():
+    periods = 1000
+    index = pd.date_range('1/1/2016', periods=periods, freq='min')
+    data = pd.DataFrame({'A': np.sin(np.arange(periods)/10.0), 
+                         'B': np.random.rand(periods)}, index=index)
+    data.iloc[500:510, 0] = np.nan
+    
+    keep = pecos.graphics._downsample_mask(data, 20)
+    assert_true(keep.sum() < 4*20*2 + 4)
+    assert_true(keep[[0, 499, 510, periods-1]].all())
+    assert_true(keep[data['B'].values.argmax()])
+    assert_equal(data[keep]['A'].max(), data['A'].max())
+    assert_equal(data[keep]['B'].min(), data['B'].min())
+    
+    keep = pecos.graphics._downsample_mask(data, 1000)
+    assert_true(keep.all())
+
 def test_plot_interactive_timeseries1():
     filename = abspath(join(testdir, 'plot_interactive_timeseries1.html'))
     if isfile(filename):
@@ -106,6 +145,12 @@ def test_plot_interactive_timeseries1():
     
     assert_true(isfile(filename))
     
+    os.remove(filename)
+    pecos.graphics.plot_interactive_timeseries(df, filename=filename, 
+                                               auto_open=False, downsample=1)
+    
+    assert_true(isfile(filename))
+    
 def test_plot_heatmap1():
     filename = abspath(join(testdir, 'plot_heatmap1.png'))
     if isfile(filename):
@@ -200,4 +245,69 @@ def test_plot_test_results2():
     
     assert_equals(len(graphics),2)
 
-    
\ No newline at end of file
+    
+def test_plot_test_results3_processes():
+    filename_root = abspath(join(testdir, 'plot_test_results3'))
+    pm = pecos.monitoring.PerformanceMonitoring()
+    periods = 5
+    index = pd.date_range('1/1/2016', periods=periods, freq='H')
+    data = np.array([[1,2,3], [4,5,6], [7,8,9], [10,11,12], [13,14,15]])
+    df = pd.DataFrame(data=data, index=index, columns=['A', 'B', 'C'])
+    
+    pm.add_dataframe(df)
+    pm.check_range([2,7]) # 4 test failures
+    
+    graphics = pecos.graphics.plot_test_results(filename_root, pm, dpi=50, 
+                                                processes=2)
+    
+    assert_equals(graphics, [filename_root + str(i) + '.png' for i in range(3)])
+    for filename in graphics:
+        assert_true(isfile(filename))
+
+def test_plot_test_results_threads():
+    # Concurrent calls (i.e. in a thread pool) use their own time filter
+    index = pd.date_range('1/1/2016', periods=5, freq='H')
+    data = np.array([[1,2,3], [4,5,6], [7,8,9], [10,11,12], [13,14,15]])
+    pms = []
+    for i, columns in enumerate([['A', 'B', 'C'], ['D', 'E', 'F']]):
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.add_dataframe(pd.DataFrame(data=data, index=index, columns=columns))
+        pm.add_time_filter(pd.Series(data=(index < index[i+2]), index=index))
+        pm.check_range([2,7])
+        pms.append(pm)
+    
+    calls = []
+    def plot_graphic(args, tfilter):
+        time.sleep(0.05)
+        calls.append((args[1], tfilter))
+    
+    plot_test_results_graphic = pecos.graphics._plot_test_results_graphic
+    pecos.graphics._plot_test_results_graphic = plot_graphic
+    pool = ThreadPool(2)
+    try:
+        pool.map(lambda pm: pecos.graphics.plot_test_results('', pm), pms)
+    finally:
+        pool.close()
+        pool.join()
+        pecos.graphics._plot_test_results_graphic = plot_test_results_graphic
+    
+    col_names = set(col_name for col_name, tfilter in calls)
+    assert_true(col_names & set(['A', 'B', 'C']))
+    assert_true(col_names & set(['D', 'E', 'F']))
+    for col_name, tfilter in calls:
+        pm = pms[0] if col_name in ['A', 'B', 'C'] else pms[1]
+        assert_true(tfilter.equals(pm.tfilter))
+
+def test_test_results_index_mask():
+    index = pd.date_range('1/1/2016', periods=10, freq='H')
+    test_results = pd.DataFrame({
+        'Start Time': [index[1], index[4], '2016-01-01 05:00:00', index[9]],
+        'End Time': [index[2], index[6], '2016-01-01 07:00:00', index[9]]})
+    
+    expected = np.array([False, True, True, False, True, True, True, True, False, True])
+    mask = pecos.graphics._test_results_index_mask(index, test_results)
+    assert_list_equal(list(mask), list(expected))
+    
+    # non-monotonic index
+    mask = pecos.graphics._test_results_index_mask(index[::-1], test_results)
+    assert_list_equal(list(mask), list(expected[::-1]))
@@ -7,6 +7,11 @@ import numpy as np
 import inspect
 import matplotlib.pylab as plt
 import logging
+import shutil
+import subprocess
+import tempfile
+import sys
+from pandas.util.testing import assert_frame_equal
 
 testdir = dirname(abspath(inspect.getfile(inspect.currentframe())))
 datadir = abspath(join(testdir, 'data'))    
@@ -18,6 +23,106 @@ def test_read_campbell_scientific():
     df = pecos.io.read_campbell_scientific(file_name, 'TIMESTAMP')
     assert_equals((48,11), df.shape)
 
+def test_read_campbell_scientific_header():
+    file_name = join(datadir,'TEST_db1_2014_01_01.dat')
+    
+    header = pecos.io.read_campbell_scientific_header(file_name)
+    assert_list_equal(header['environment'], ['HEADER'])
+    assert_equals(len(header['columns']), 12)
+    assert_equals(header['columns'][0], 'TIMESTAMP')
+    assert_equals(header['units'][0:2], ['TS', 'RN'])
+    assert_equals(header['processing'][0], '1:00:00')
+
+def test_read_campbell_scientific_chunksize():
+    file_name = join(datadir,'TEST_db1_2014_01_01.dat')
+    df = pecos.io.read_campbell_scientific(file_name)
+    
+    chunks = pecos.io.read_campbell_scientific(file_name, dtype='float32', 
+                                               chunksize=20)
+    chunks = list(chunks)
+    assert_equals(len(chunks), 3)
+    df32 = pd.concat(chunks)
+    assert_true((df32.dtypes == np.float32).all())
+    assert_true(df32.index.equals(df.index))
+    assert_true(np.allclose(df32.values, df.values, equal_nan=True))
+
+def test_read_campbell_scientific_files():
+    file_name = join(datadir,'TEST_db1_2014_01_01.dat')
+    with open(file_name, 'r') as f:
+        text = f.read()
+    
+    # Create two daily files, the second file is shifted by 2 days
+    file_name1 = join(testdir,'test_read_campbell_scientific_files_2014_01_01.dat')
+    file_name2 = join(testdir,'test_read_campbell_scientific_files_2014_01_03.dat')
+    with open(file_name1, 'w') as f:
+        f.write(text)
+    with open(file_name2, 'w') as f:
+        f.write(text.replace('1/2/2014', '1/4/2014').replace('1/1/2014', '1/3/2014'))
+    
+    # The file contains duplicate timestamps
+    n = len(pecos.io.read_campbell_scientific(file_name).index.unique())
+    
+    df = pecos.io.read_campbell_scientific_files(
+            join(testdir,'test_read_campbell_scientific_files_*.dat'), processes=2)
+    assert_equals((2*n,11), df.shape)
+    assert_true(df.index.is_monotonic_increasing)
+    assert_true(df.index.is_unique)
+    
+    # Date range, the missing file (2014_01_02) is skipped
+    df = pecos.io.read_campbell_scientific_files(
+            join(testdir,'test_read_campbell_scientific_files_%Y_%m_%d.dat'), 
+            start_date='2014-01-01', end_date='2014-01-03', processes=1)
+    assert_equals((2*n,11), df.shape)
+    
+    df = pecos.io.read_campbell_scientific_files([file_name1, file_name1])
+    assert_equals((n,11), df.shape)
+    
+def test_read_cached():
+    directory = tempfile.mkdtemp()
+    try:
+        file_name = join(directory,'test_read_cached.dat')
+        cache_dir = join(directory,'cache')
+        shutil.copyfile(join(datadir,'TEST_db1_2014_01_01.dat'), file_name)
+        
+        df1 = pecos.io.read_cached(file_name, cache_dir=cache_dir)
+        assert_equals(len(os.listdir(cache_dir)), 1)
+        df2 = pecos.io.read_cached(file_name, cache_dir=cache_dir)
+        assert_frame_equal(df1, df2)
+        
+        # Cached data is copy-on-write
+        df2.iloc[0,0] = -999
+        df3 = pecos.io.read_cached(file_name, cache_dir=cache_dir)
+        assert_frame_equal(df1, df3)
+        
+        # The cache is updated if the file changes
+        with open(file_name, 'a') as f:
+            f.write('1/3/2014 0:00,1,1,1,1,1,1,1,1,1,1,1\n')
+        df4 = pecos.io.read_cached(file_name, cache_dir=cache_dir)
+        assert_equals(df4.shape, (df1.shape[0]+1, df1.shape[1]))
+        assert_equals(len(os.listdir(cache_dir)), 1)
+        
+        # The default cache directory is next to the file
+        pecos.io.read_cached(file_name)
+        assert_true(os.path.isdir(join(directory, '.pecos_cache')))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True) # memory-mapped files can't be removed on Windows
+
+def test_write_column_store():
+    directory = tempfile.mkdtemp()
+    try:
+        index = pd.date_range('1/1/2016', periods=4, freq='H', tz='MST')
+        df = pd.DataFrame({'A': [1.5, 2, np.nan, 4], 'B': [1, 2, 3, 4], 
+                           'C': [True, False, True, True]}, index=index)
+        
+        pecos.io.write_column_store(df, directory)
+        assert_true(isfile(join(directory, 'metadata.json')))
+        
+        df2 = pecos.io.read_column_store(directory)
+        assert_frame_equal(df, df2)
+        assert_equal(df2.index.freq, 'H')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True) # memory-mapped files can't be removed on Windows
+    
 def test_write_metrics1():
     filename = abspath(join(testdir, 'test_write_metrics1.csv'))
     if isfile(filename):
@@ -44,6 +149,100 @@ def test_write_metrics1():
     from_file3= pd.read_csv(filename)
     assert_equals(from_file3.shape, (2,3))
 
+def test_write_metrics_store():
+    directory = tempfile.mkdtemp()
+    try:
+        index = pd.date_range('1/30/2016', periods=4, freq='D')
+        metrics = pd.DataFrame({'metric1': [1., 2, 3, 4]}, index=index)
+        pecos.io.write_metrics_store(directory, metrics)
+        assert_true(isfile(join(directory, 'metrics_2016-01.csv')))
+        assert_true(isfile(join(directory, 'metrics_2016-02.csv')))
+
+        # update metric1 and add metric2, only the February partition changes
+        metrics = pd.DataFrame({'metric1': [5.], 'metric2': [6.]}, 
+                               index=[pd.Timestamp('2016-02-02')])
+        pecos.io.write_metrics_store(directory, metrics)
+
+        from_store = pecos.io.read_metrics_store(directory)
+        assert_equals(from_store.shape, (4,2))
+        assert_list_equal(list(from_store['metric1']), [1., 2, 3, 5])
+        assert_equals(pd.read_csv(join(directory, 'metrics_2016-01.csv')).shape, (2,2))
+
+        from_store = pecos.io.read_metrics_store(directory, start_date='2016-02-01')
+        assert_equals(from_store.shape, (2,2))
+        from_store = pecos.io.read_metrics_store(directory, end_date='2016-01-30')
+        assert_equals(from_store.shape, (1,1))
+    finally:
+        shutil.rmtree(directory)
+
+def test_write_metrics_store_timezone():
+    directory = tempfile.mkdtemp()
+    try:
+        index = pd.date_range('1/31/2016', periods=4, freq='12H', tz='MST')
+        metrics = pd.DataFrame({'metric1': [1., 2, 3, 4]}, index=index)
+        pecos.io.write_metrics_store(directory, metrics)
+
+        # Times are returned in UTC, dates without a time zone are in UTC
+        from_store = pecos.io.read_metrics_store(directory)
+        assert_list_equal(list(from_store.index.asi8), list(index.asi8))
+        from_store = pecos.io.read_metrics_store(directory, '2016-02-01', 
+                                                 '2016-02-02')
+        assert_list_equal(list(from_store['metric1']), [3., 4])
+        from_store = pecos.io.read_metrics_store(directory, 
+                            start_date=pd.Timestamp('2016-01-31 12:00', tz='MST'))
+        assert_list_equal(list(from_store['metric1']), [2., 3, 4])
+    finally:
+        shutil.rmtree(directory)
+
+def test_write_metrics_lock():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = join(directory, 'test_write_metrics_lock.csv')
+        lock = filename + '.lock'
+        metrics = pd.DataFrame({'metric1' : pd.Series([1.], index=[pd.datetime(2016,1,1)])})
+        with pecos.io._FileLock(lock):
+            assert_raises(RuntimeError, pecos.io.write_metrics, filename, metrics, 
+                          timeout=0.1)
+        assert_false(isfile(lock))
+
+        pecos.io.write_metrics(filename, metrics)
+        assert_false(isfile(lock))
+
+        # The lock is released if the owner process exits without releasing it
+        code = 'import os, pecos.io; pecos.io._FileLock(%r).__enter__(); os._exit(0)' % lock
+        subprocess.check_call([sys.executable, '-c', code])
+        assert_true(isfile(lock))
+        pecos.io.write_metrics(filename, metrics, timeout=0.1)
+        assert_false(isfile(lock))
+    finally:
+        shutil.rmtree(directory)
+
+def test_write_metrics_concurrent():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = join(directory, 'test_write_metrics_concurrent.csv')
+
+        # Each process writes one metric, one timestep at a time
+        code = """
+import pandas as pd, pecos.io
+for i in range(20):
+    metrics = pd.DataFrame({'metric%d': [float(i)]}, 
+                           index=[pd.Timestamp('2016-01-01') + pd.Timedelta(hours=i)])
+    pecos.io.write_metrics(%r, metrics)
+"""
+        processes = [subprocess.Popen([sys.executable, '-c', code % (j, filename)])
+                     for j in range(4)]
+        for process in processes:
+            assert_equal(process.wait(), 0)
+
+        metrics = pd.read_csv(filename, index_col='TIMESTEP')
+        assert_equal(metrics.shape, (20, 4))
+        for j in range(4):
+            assert_list_equal(list(metrics['metric%d' % j]), list(range(20)))
+        assert_false(isfile(filename + '.lock'))
+    finally:
+        shutil.rmtree(directory)
+
 def test_write_test_results1():
     filename = abspath(join(testdir, 'test_write_test_results1.csv'))
     if isfile(filename):
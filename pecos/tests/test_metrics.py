@@ -1,6 +1,7 @@
 from nose.tools import *
 from os.path import abspath, dirname, join
 import pecos
+from pandas.util.testing import assert_frame_equal
 import numpy as np
 import pandas as pd
 
@@ -28,6 +29,50 @@ def test_pd_far():
     assert_almost_equal(prob_detection, 3/6.0, 5)
     assert_almost_equal(false_alarm, 2/6.0, 5)
     
+def test_confusion_matrix():
+    index = pd.date_range('1/1/2016', periods=4, freq='12H')
+    
+    actual = np.array([[True,  False, False], 
+                       [False, False, True], 
+                       [True,  False, False], 
+                       [True,  True,  True]])
+    actual = pd.DataFrame(data=actual, index=index, columns=['A', 'B', 'C'])
+    
+    obser = np.array([[True, False, True], 
+                      [True, False, True], 
+                      [True, True,  False], 
+                      [True, False, False]])
+    obser = pd.DataFrame(data=obser, index=index, columns=['A', 'B', 'C'])
+    
+    counts = pecos.metrics.confusion_matrix(obser, actual)
+    expected = pd.DataFrame([[3, 2, 4, 3]], index=[0], columns=['TP', 'FP', 'TN', 'FN'])
+    assert_frame_equal(counts, expected)
+    
+    counts = pecos.metrics.confusion_matrix(obser, actual, per_column=True)
+    expected = pd.DataFrame([[0, 0, 3, 1], [2, 1, 0, 1], [1, 1, 1, 1]], 
+                            index=['A', 'B', 'C'], columns=['TP', 'FP', 'TN', 'FN'])
+    assert_frame_equal(counts, expected)
+    
+    counts = pecos.metrics.confusion_matrix(obser, actual, period='D', per_column=True)
+    assert_equal(counts.shape, (6, 4))
+    assert_equal(list(counts.loc[('2016-01-02', 'B')]), [0, 1, 0, 1])
+    assert_frame_equal(counts.sum(level=1), 
+        pecos.metrics.confusion_matrix(obser, actual, per_column=True))
+    
+    # NaN is not counted
+    obser = obser.astype(object)
+    obser.iloc[0,:] = np.nan
+    counts = pecos.metrics.confusion_matrix(obser, actual)
+    assert_equal(counts.sum().sum(), 9)
+    
+    results = pecos.metrics.confusion_matrix_metrics(pd.DataFrame([[3, 2, 4, 3]], 
+                                            columns=['TP', 'FP', 'TN', 'FN']))
+    assert_almost_equal(results['Probability of Detection'][0], 3/6.0, 5)
+    assert_almost_equal(results['False Alarm Rate'][0], 2/6.0, 5)
+    assert_almost_equal(results['Precision'][0], 3/5.0, 5)
+    assert_almost_equal(results['F1 Score'][0], 6/11.0, 5)
+    assert_almost_equal(results['Accuracy'][0], 7/12.0, 5)
+    
 def test_time_integral():
     periods = 5
     index = pd.date_range('1/1/2016', periods=periods, freq='H')
@@ -40,6 +85,18 @@ def test_time_integral():
     assert_equal(df_integral['Time integral of B'].values[0], 115200)
     assert_equal(df_integral['Time integral of C'].values[0], 129600)
     
+def test_time_integral_perday():
+    index = pd.date_range('1/1/2016 22:00', periods=6, freq='H')
+    index = index.delete(3) # 2016-01-02 01:00
+    df = pd.DataFrame({'A': [0.5, 1.5, 2.5, 4.5, 5.5]}, index=index)
+    df = df.reindex(index.append(pd.DatetimeIndex(['1/4/2016 12:00'])))
+    
+    df_integral = pecos.metrics.time_integral(df)
+    
+    expected = pd.DataFrame({'Time integral of A': [3600.0, 7200*3.5+3600*5.0, 0.0, 0.0]}, 
+                            index=pd.date_range('1/1/2016', periods=4, freq='D'))
+    assert_frame_equal(df_integral, expected)
+    
 def test_qci_no_test_results():
     periods = 5
     np.random.seed(100)
@@ -146,4 +203,68 @@ def test_rmse():
     
     RMSE = pecos.metrics.rmse(x1, x2)
     
-    assert_almost_equal(RMSE.iloc[0,0], 2.8667, 4)
\ No newline at end of file
+    assert_almost_equal(RMSE.iloc[0,0], 2.8667, 4)
+def test_metrics_period():
+    periods = 24*60
+    np.random.seed(100)
+    index = pd.date_range('1/1/2016', periods=periods, freq='H')
+    mask = pd.DataFrame(np.random.rand(periods, 3) > 0.2, index=index, 
+                        columns=['A', 'B', 'C'])
+    x1 = pd.Series(np.random.rand(periods), index=index)
+    x2 = pd.Series(np.random.rand(periods), index=index)
+    df = pd.DataFrame({'A': np.random.rand(periods)}, index=index)
+    
+    QCI = pecos.metrics.qci(mask, period='6H')
+    assert_equal(QCI.shape, (4*60, 1))
+    assert_almost_equal(QCI.iloc[1,0], mask.iloc[6:12].sum().sum()/18.0)
+    
+    QCI_day = pecos.metrics.qci(mask, period='D')
+    assert_frame_equal(QCI_day, pecos.metrics.qci(mask))
+    
+    F = pecos.metrics.time_integral(df, period='W')
+    assert_equal(F.shape, (10, 1))
+    assert_almost_equal(F.iloc[1,0], pecos.metrics.time_integral(df.loc['1/4/2016':'1/10/2016'], 
+                                                                 per_day=False).iloc[0,0])
+    
+    RMSE = pecos.metrics.rmse(x1, x2, period='MS')
+    assert_equal(RMSE.shape, (2, 1))
+    assert_almost_equal(RMSE.iloc[1,0], pecos.metrics.rmse(x1['2/1/2016':], x2['2/1/2016':], 
+                                                           per_day=False).iloc[0,0])
+
+def test_rollup():
+    periods = 24*60
+    np.random.seed(100)
+    index = pd.date_range('1/1/2016', periods=periods, freq='H')
+    mask = pd.DataFrame(np.random.rand(periods, 3) > 0.2, index=index, 
+                        columns=['A', 'B', 'C'])
+    x1 = pd.Series(np.random.rand(periods), index=index)
+    x2 = pd.Series(np.random.rand(periods), index=index)
+    df = pd.DataFrame({'A': np.random.rand(periods)}, index=index)
+    
+    QCI_sums = pecos.metrics.qci(mask, partial_sums=True)
+    assert_equal(list(QCI_sums.columns), ['Number of passing data points', 'Number of data points'])
+    assert_frame_equal(pecos.metrics.rollup(QCI_sums, 'D'), pecos.metrics.qci(mask))
+    assert_frame_equal(pecos.metrics.rollup(QCI_sums, 'MS'), pecos.metrics.qci(mask, period='MS'))
+    
+    RMSE_sums = pecos.metrics.rmse(x1, x2, period='H', partial_sums=True)
+    assert_frame_equal(pecos.metrics.rollup(RMSE_sums, 'MS'), pecos.metrics.rmse(x1, x2, period='MS'))
+    
+    # Time steps between days are not included in the daily time integral
+    F = pecos.metrics.time_integral(df)
+    F_month = pecos.metrics.rollup(F, 'MS')
+    assert_almost_equal(F_month.iloc[0,0], F.loc['1/1/2016':'1/31/2016'].sum()[0])
+    
+    # Time steps between days are included using partial sums
+    F_sums = pecos.metrics.time_integral(df, partial_sums=True)
+    assert_frame_equal(pecos.metrics.rollup(F_sums, 'D'), F)
+    assert_frame_equal(pecos.metrics.rollup(F_sums, 'MS'), 
+                       pecos.metrics.time_integral(df, period='MS'))
+    F_sums = pecos.metrics.time_integral(df, period='H', partial_sums=True)
+    assert_frame_equal(pecos.metrics.rollup(F_sums, 'W'), 
+                       pecos.metrics.time_integral(df, period='W'))
+    
+    df = pd.DataFrame({'A': 1.0}, index=index)
+    F_sums = pecos.metrics.time_integral(df, partial_sums=True)
+    assert_frame_equal(pecos.metrics.rollup(F_sums, 'MS'), 
+                       pecos.metrics.time_integral(df, period='MS'))
+    assert_equal(pecos.metrics.rollup(F_sums, 'MS').iloc[0,0], 2674800)
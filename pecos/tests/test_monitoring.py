@@ -1,4 +1,7 @@
 import unittest
+import time
+import tempfile
+import shutil
 from nose.tools import *
 from os.path import abspath, dirname, join
 import pecos
@@ -91,7 +94,7 @@ class Test_simple_example(unittest.TestCase):
 
         file_name = join(simpleexampledir,'simple.xlsx')
 
-        df = pd.read_excel(file_name)
+        df = pd.read_excel(file_name, index_col=0)
         self.pm = pecos.monitoring.PerformanceMonitoring()
         self.pm.add_dataframe(df)
         self.pm.add_translation_dictionary(trans)
@@ -114,6 +117,24 @@ class Test_simple_example(unittest.TestCase):
                  (self.pm.df.index < pd.Timestamp('2015-01-01 21:00:00'))] = True
                 
         assert_frame_equal(time_filter, expected, check_dtype=False)
+    
+    def test_evaluate_string_with_specs(self):
+        string_to_eval = "{Wave}*{Scale} + {Offset}"
+        specs = {'Scale': 2, 'Offset': 1}
+        signal = self.pm.evaluate_string('Wave Model', string_to_eval, specs)
+        
+        expected = self.pm.df[['C','D']]*2 + 1
+        expected.columns = ['Wave Model 1', 'Wave Model 2']
+        assert_frame_equal(signal, expected)
+        
+        # Repeat evaluations use the cached compiled expression
+        key = (string_to_eval, ('Offset', 'Scale', 'Wave'))
+        assert_in(key, pecos.monitoring._expression_cache)
+        specs = {'Scale': 3, 'Offset': 0}
+        signal = self.pm.evaluate_string('Wave Model', string_to_eval, specs)
+        assert_frame_equal(signal, pd.DataFrame(
+            self.pm.df[['C','D']].values*3, index=expected.index, 
+            columns=expected.columns))
         
     def test_check_timestamp(self):
         test_results = self.pm.test_results
@@ -247,7 +268,7 @@ class Test_simple_example(unittest.TestCase):
 
     def test_full_example(self):
         data_file = join(simpleexampledir,'simple.xlsx')
-        df = pd.read_excel(data_file)
+        df = pd.read_excel(data_file, index_col=0)
 
         (QCI, test_results_file) = simple_example_run_analysis(df)
 
@@ -267,7 +288,7 @@ class Test_simple_example(unittest.TestCase):
 
     def test_full_example_with_timezone(self):
         data_file = join(simpleexampledir,'simple.xlsx')
-        df = pd.read_excel(data_file)
+        df = pd.read_excel(data_file, index_col=0)
         df.index = df.index.tz_localize('MST')
 
         (QCI, test_results_file) = simple_example_run_analysis(df)
@@ -367,6 +388,12 @@ class Test_check_timestamp(unittest.TestCase):
             )
         assert_frame_equal(expected, self.pm.test_results)
 
+    def test_check_timestamp_index_type(self):
+        # The index must be a DatetimeIndex
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.add_dataframe(self.pm.df.reset_index(drop=True))
+        assert_raises(TypeError, pm.check_timestamp, 3600)
+
 class Test_check_delta(unittest.TestCase):
 
     @classmethod
@@ -429,6 +456,105 @@ class Test_check_delta(unittest.TestCase):
             )
         assert_frame_equal(expected, self.pm.test_results)
 
+    def test_rolling_min_max(self):
+        np.random.seed(10)
+        time = np.cumsum(np.random.randint(1, 5, 200))
+        values = np.random.randint(0, 10, (200, 2)).astype(float)
+        values[np.random.rand(200, 2) < 0.2] = np.nan
+        
+        min_values, argmin, max_values, argmax = \
+            pecos.monitoring._rolling_min_max(values, time, 10)
+        
+        for i in range(200):
+            for j in range(2):
+                window = (time > time[i]-10) & (time <= time[i])
+                data = pd.Series(values[window,j], index=np.where(window)[0])
+                if data.notnull().sum() < 2:
+                    assert_true(np.isnan(min_values[i,j]))
+                    assert_true(np.isnan(max_values[i,j]))
+                else:
+                    assert_equal(min_values[i,j], data.min())
+                    assert_equal(argmin[i,j], data.idxmin())
+                    assert_equal(max_values[i,j], data.max())
+                    assert_equal(argmax[i,j], data.idxmax())
+
+class Test_check_range(unittest.TestCase):
+
+    @classmethod
+    def setUp(self):
+        index = pd.date_range('1/1/2017', periods=8, freq='H')
+        data = {'A': [0, 1, 2, 3, 4, 5, 6, 7], 
+                'B': [7, 6, 5, 4, 3, 2, 1, 0]}
+        df = pd.DataFrame(data, index=index)
+        trans = dict(zip(df.columns, [[col] for col in df.columns]))
+        
+        self.pm = pecos.monitoring.PerformanceMonitoring()
+        self.pm.add_dataframe(df)
+        self.pm.add_translation_dictionary(trans)
+        
+    @classmethod
+    def tearDown(self):
+        pass
+    
+    def test_lower_and_upper_bound(self):
+        bound = ['{Min}', 5]
+        self.pm.check_range(bound, specs={'Min': 2.0})
+        assert_equal(bound, ['{Min}', 5]) # bound is not modified
+        
+        test_results = self.pm.test_results
+        assert_list_equal(list(test_results['Error Flag']), 
+            ['Data < lower bound, 2.0', 'Data < lower bound, 2.0', 
+             'Data > upper bound, 5', 'Data > upper bound, 5'])
+        assert_list_equal(list(test_results['Variable Name']), ['A', 'B', 'A', 'B'])
+        assert_list_equal(list(test_results['Timesteps']), [2, 2, 2, 2])
+    
+    def test_lower_bound_greater_than_upper_bound(self):
+        self.pm.check_range([5, 2], 'A')
+        test_results = self.pm.test_results
+        assert_list_equal(list(test_results['Timesteps']), [5, 5])
+        assert_list_equal(list(test_results['Start Time']), 
+                          [self.pm.df.index[0], self.pm.df.index[3]])
+    
+    def test_time_varying_bound(self):
+        # A > B 
+        self.pm.check_range([None, '{B}'], 'A')
+        test_results = self.pm.test_results
+        assert_equal(test_results.shape[0], 1)
+        assert_equal(test_results.loc[0, 'Start Time'], self.pm.df.index[4])
+        assert_equal(test_results.loc[0, 'Error Flag'], 'Data > upper bound, {B}')
+
+    def test_per_column_bound(self):
+        def sorted_flags(bound, key=None):
+            pm = pecos.monitoring.PerformanceMonitoring()
+            pm.add_dataframe(self.pm.df)
+            pm.add_translation_dictionary(self.pm.trans)
+            pm.check_range(bound, key)
+            return sorted(zip(pm.test_results['Variable Name'], 
+                              pm.test_results['Error Flag'],
+                              pm.test_results['Start Time']))
+        
+        expected = sorted_flags([1, 5], 'A') + sorted_flags([2, 6], 'B')
+        # Dictionary of column names or translation keys, list, and Series 
+        # indexed by column names
+        for bound in [[{'A': 1, 'B': 2}, {'A': 5, 'B': 6}],
+                      [[1, 2], [5, 6]],
+                      [pd.Series({'A': 1, 'B': 2}), pd.Series({'A': 5, 'B': 6})]]:
+            assert_list_equal(sorted_flags(bound), sorted(expected))
+        assert_equal(expected[0][1], 'Data < lower bound, 1')
+        
+        # Columns that are not in the dictionary are not tested
+        flags = sorted_flags([None, {'B': 6}])
+        assert_list_equal(flags, [('B', 'Data > upper bound, 6', self.pm.df.index[0])])
+    
+    def test_time_series_bound(self):
+        upper = pd.Series([1, 1, 1, 1, 10, 10, 10, 10], index=self.pm.df.index)
+        self.pm.check_range([None, upper], 'A')
+        test_results = self.pm.test_results
+        assert_equal(test_results.shape[0], 1)
+        assert_equal(test_results.loc[0, 'Start Time'], self.pm.df.index[2])
+        assert_equal(test_results.loc[0, 'Timesteps'], 2)
+        assert_equal(test_results.loc[0, 'Error Flag'], 'Data > upper bound, time series')
+
 class Test_check_outlier(unittest.TestCase):
 
     @classmethod
@@ -457,4 +583,382 @@ class Test_check_outlier(unittest.TestCase):
             index=RangeIndex(start=0, stop=2, step=1)
             )
         assert_frame_equal(expected, self.pm.test_results)
-        
\ No newline at end of file
+
+    def test_outlier_robust(self):
+        # median = 112, MAD = 10, outlier if (data-median)/(1.4826*MAD) > 1.85
+        self.pm.check_outlier([-1.85, 1.85], window=None, absolute_value=False,
+                              robust=True)
+        test_results = self.pm.test_results
+        assert_list_equal(list(test_results['Start Time']),
+                          [Timestamp('2017-01-01 19:00:00'),
+                           Timestamp('2017-01-01 06:00:00'),
+                           Timestamp('2017-01-01 12:00:00')])
+
+        # Median and MAD of each window, which includes data in 
+        # (t-window, t]
+        window = 6*3600
+        self.pm.test_results = pd.DataFrame(columns=test_results.columns)
+        self.pm.check_outlier([None, 2], window=window, robust=True)
+        data = self.pm.df['A']
+        expected = []
+        for t in data.index:
+            values = data[(data.index > t - pd.Timedelta(seconds=window)) & 
+                          (data.index <= t)].dropna().values
+            median = np.median(values)
+            mad = np.median(np.abs(values - median))
+            if np.abs(data[t] - median)/(1.4826*mad) > 2:
+                expected.append(t)
+        mask = self.pm.get_test_results_mask()
+        flagged = mask.index[~mask['A'] & data.notnull()]
+        assert_list_equal(list(flagged), expected)
+        assert_equal(self.pm.test_results['Timesteps'].sum(), len(expected))
+
+    def test_outlier_robust_large(self):
+        # The rolling median and MAD are vectorized, a rolling apply takes
+        # more than 30 s on this data
+        np.random.seed(10)
+        index = pd.date_range('1/1/2017', periods=100000, freq='s')
+        data = np.random.gamma(2, size=(100000, 2))
+        data[np.random.rand(100000, 2) < 0.05] = np.nan
+        df = pd.DataFrame(data, index=index, columns=['A', 'B'])
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.add_dataframe(df)
+
+        start_time = time.time()
+        pm.check_outlier([None, 3], window=3600, robust=True)
+        assert_true(time.time() - start_time < 10)
+
+        # Spot check the MAD of the last window
+        values = df['A'].iloc[-3600:].dropna().values
+        mad = np.median(np.abs(values - np.median(values)))
+        scale = pm._rolling(df[['A','B']], str(int(3600*1e6)) + 'us', 'mad')
+        assert_almost_equal(scale['A'].iloc[-1], mad)
+
+    def test_rolling_cache(self):
+        self.pm.check_outlier([None, 1.5], window=4*3600, rolling_mean=2*3600)
+        self.pm.check_range([None, 130], rolling_mean=2*3600)
+        # rolling mean (used in both tests), rolling mean and std of the 
+        # smoothed data (used in the outlier test)
+        assert_equal(len(self.pm._rolling_cache), 3)
+        test_results = self.pm.test_results
+        
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.add_dataframe(self.pm.df)
+        pm.check_outlier([None, 1.5], window=4*3600, rolling_mean=2*3600)
+        pm.check_range([None, 130], rolling_mean=2*3600)
+        assert_frame_equal(test_results, pm.test_results)
+        
+        # The cache is cleared when data changes
+        self.pm.check_corrupt([150])
+        assert_equal(len(self.pm._rolling_cache), 0)
+        self.pm.check_range([None, 130], rolling_mean=2*3600)
+        self.pm.df = self.pm.df*2
+        assert_equal(len(self.pm._rolling_cache), 0)
+        self.pm.test_results = pd.DataFrame(columns=test_results.columns)
+        self.pm.check_range([None, 130], rolling_mean=2*3600)
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.add_dataframe(self.pm.df)
+        pm.check_range([None, 130], rolling_mean=2*3600)
+        assert_frame_equal(self.pm.test_results, pm.test_results)
+        
+class Test_add_dataframe(unittest.TestCase):
+
+    @classmethod
+    def setUp(self):
+        index = pd.date_range('1/1/2017', periods=4, freq='H')
+        self.df = pd.DataFrame({'C': [0., 1, 2, 3], 'A': [4., 5, 6, 7]}, 
+                               index=index)[['C', 'A']]
+        self.pm = pecos.monitoring.PerformanceMonitoring()
+        self.pm.add_dataframe(self.df)
+        
+    @classmethod
+    def tearDown(self):
+        pass
+    
+    def test_new_columns(self):
+        df = pd.DataFrame({'B': [8., 9, 10, 11]}, index=self.df.index)
+        self.pm.add_dataframe(df)
+        assert_frame_equal(df.combine_first(self.df), self.pm.df)
+        assert_list_equal(self.pm.trans['B'], ['B'])
+    
+    def test_new_columns_subset_index(self):
+        df = pd.DataFrame({'B': [8., 9]}, index=self.df.index[[1,3]])
+        self.pm.add_dataframe(df)
+        assert_frame_equal(df.combine_first(self.df), self.pm.df)
+        assert_equal(self.pm.df.index.freq, None)
+        assert_equal(self.df.index.freq, 'H')
+        
+    def test_existing_columns(self):
+        index = self.df.index.shift(2, freq='H')
+        df = pd.DataFrame({'A': [8., np.nan, 10, 11]}, index=index)
+        self.pm.add_dataframe(df)
+        assert_frame_equal(df.combine_first(self.df), self.pm.df)
+        
+class Test_append_test_results(unittest.TestCase):
+
+    @classmethod
+    def setUp(self):
+        index = pd.date_range('1/1/2017', periods=10, freq='H')
+        data = {'A': [0, 5, 5, 0, 5, 5, 5, 0, 0, 5], 
+                'B': [5, 0, 0, 0, 0, 0, 0, 0, 5, 5]}
+        df = pd.DataFrame(data, index=index)
+        
+        self.pm = pecos.monitoring.PerformanceMonitoring()
+        self.pm.add_dataframe(df)
+        
+    @classmethod
+    def tearDown(self):
+        pass
+    
+    def test_min_failures(self):
+        self.pm.check_range([None, 1], min_failures=2)
+        expected = pd.DataFrame(
+            array([['A', Timestamp('2017-01-01 01:00:00'), Timestamp('2017-01-01 02:00:00'), 2, 'Data > upper bound, 1'],
+                   ['A', Timestamp('2017-01-01 04:00:00'), Timestamp('2017-01-01 06:00:00'), 3, 'Data > upper bound, 1'],
+                   ['B', Timestamp('2017-01-01 08:00:00'), Timestamp('2017-01-01 09:00:00'), 2, 'Data > upper bound, 1']], dtype=object),
+            columns=['Variable Name', 'Start Time', 'End Time', 'Timesteps', 'Error Flag'],
+            index=RangeIndex(start=0, stop=3, step=1)
+            )
+        assert_frame_equal(expected, self.pm.test_results)
+        
+        # Start and end times have the same type as the index
+        assert_equal(self.pm.test_results['Start Time'].dtype, 
+                     self.pm.df.index.dtype)
+        assert_equal(self.pm.test_results['End Time'].dtype, 
+                     self.pm.df.index.dtype)
+    
+    def test_get_test_results_mask(self):
+        self.pm.df.index = self.pm.df.index.tz_localize('MST')
+        self.pm.check_range([None, 1], min_failures=2)
+        self.pm.test_results = self.pm.test_results.append(
+            pd.DataFrame({'Variable Name': ['B', 'C'], 
+                          'Start Time': ['2017-01-01 02:00:00', '2017-01-01 02:00:00'], 
+                          'End Time': ['2017-01-01 03:00:00', '2017-01-01 03:00:00'], 
+                          'Timesteps': [2, 2], 'Error Flag': ['Error Flag', 'Error Flag']}), 
+            ignore_index=True)
+        mask = self.pm.get_test_results_mask()
+        
+        expected = pd.DataFrame({
+            'A': [True, False, False, True, False, False, False, True, True, True],
+            'B': [True, True, False, False, True, True, True, True, False, False]}, 
+            index=self.pm.df.index)
+        assert_frame_equal(expected, mask)
+        
+        mask = self.pm.get_test_results_mask('B')
+        assert_frame_equal(expected[['B']], mask)
+        
+        mask = self.pm.get_test_results_mask(intervals=True)
+        assert_frame_equal(expected, mask.to_dataframe())
+        assert_equal(list(mask.sum()), [5, 6])
+
+class Test_interval_mask(unittest.TestCase):
+
+    @classmethod
+    def setUp(self):
+        index = pd.date_range('1/1/2017', periods=6, freq='H')
+        self.a = pd.DataFrame({'A': [True, True, False, False, True, False], 
+                               'B': [False, False, False, False, False, True]}, 
+                              index=index)
+        self.b = pd.DataFrame({'A': [False, True, True, False, False, False], 
+                               'B': [True, True, True, True, True, True]}, 
+                              index=index)
+        
+    @classmethod
+    def tearDown(self):
+        pass
+    
+    def test_from_dataframe(self):
+        mask = pecos.monitoring.IntervalMask.from_dataframe(self.a)
+        assert_list_equal(list(mask.col), [0, 0, 1])
+        assert_list_equal(list(mask.start), [0, 4, 5])
+        assert_list_equal(list(mask.stop), [2, 5, 6])
+        assert_frame_equal(mask.to_dataframe(), self.a)
+        assert_equal(mask.shape, (6, 2))
+        
+        # Overlapping and adjacent intervals are merged
+        mask = pecos.monitoring.IntervalMask(self.a.index, self.a.columns, 
+                                   [1, 0, 0], [0, 3, 0], [6, 4, 3])
+        assert_list_equal(list(mask.start), [0, 0])
+        assert_list_equal(list(mask.stop), [4, 6])
+    
+    def test_operations(self):
+        a = pecos.monitoring.IntervalMask.from_dataframe(self.a)
+        b = pecos.monitoring.IntervalMask.from_dataframe(self.b)
+        assert_frame_equal((a | b).to_dataframe(), self.a | self.b)
+        assert_frame_equal((a & b).to_dataframe(), self.a & self.b)
+        assert_frame_equal((~a).to_dataframe(), ~self.a)
+        assert_frame_equal(a.sum().to_frame(), self.a.sum().to_frame())
+        
+        rows = np.array([True, False, True, True, True, False])
+        expected = self.a.copy()
+        expected[~rows] = False
+        assert_frame_equal(a.filter_rows(rows).to_dataframe(), expected)
+        
+        c = pecos.monitoring.IntervalMask.from_dataframe(self.a[['A']])
+        assert_raises(ValueError, a.__or__, c)
+
+class Test_test_results_store(unittest.TestCase):
+
+    @classmethod
+    def setUp(self):
+        self.store = pecos.monitoring.TestResultsStore(capacity=1)
+        
+    @classmethod
+    def tearDown(self):
+        pass
+    
+    def test_append(self):
+        index = pd.date_range('1/1/2017', periods=4, freq='H', tz='MST')
+        self.store.append(['A', 'B'], index[[0,2]], index[[1,3]], 
+                          np.array([2, 2]), 'Error Flag 1')
+        self.store.append('A', index[[3]], index[[3]], np.array([1]), 
+                          'Error Flag 2')
+        self.store.append_dataframe(pd.DataFrame(
+            {'Variable Name': ['C'], 'Start Time': ['2017-01-01 01:00:00'], 
+             'End Time': ['2017-01-01 02:00:00'], 'Timesteps': [2], 
+             'Error Flag': ['Error Flag 1']}))
+        
+        expected = pd.DataFrame(
+            array([['A', index[0], index[1], 2, 'Error Flag 1'],
+                   ['B', index[2], index[3], 2, 'Error Flag 1'],
+                   ['A', index[3], index[3], 1, 'Error Flag 2'],
+                   ['C', index[1], index[2], 2, 'Error Flag 1']], dtype=object),
+            columns=['Variable Name', 'Start Time', 'End Time', 'Timesteps', 'Error Flag'],
+            index=RangeIndex(start=0, stop=4, step=1)
+            )
+        assert_equal(len(self.store), 4)
+        assert_frame_equal(expected, self.store.to_dataframe())
+
+    def test_append_mixed_time_zones(self):
+        # Times without a time zone are in the time zone of the store
+        times = pd.Series([Timestamp('2017-01-01 01:00:00', tz='MST'),
+                           '2017-01-01 02:00:00'], dtype=object)
+        self.store.append(['A', 'B'], times, times, np.array([1, 1]),
+                          'Error Flag')
+
+        test_results = self.store.to_dataframe()
+        expected = pd.DatetimeIndex(['2017-01-01 01:00:00',
+                                     '2017-01-01 02:00:00'], tz='MST')
+        assert_equal(str(test_results['Start Time'].dtype),
+                     'datetime64[ns, MST]')
+        assert_list_equal(list(test_results['Start Time']), list(expected))
+        assert_list_equal(list(test_results['End Time']), list(expected))
+
+    def test_set_test_results(self):
+        pm = pecos.monitoring.PerformanceMonitoring()
+        test_results = pd.read_csv(join(datadir,'Simple_test_results.csv'), index_col=0)
+        pm.test_results = test_results
+        
+        assert_equal(pm.test_results.shape, test_results.shape)
+        assert_list_equal(list(pm.test_results['Error Flag']), 
+                          list(test_results['Error Flag']))
+        assert_equal(pm.test_results['Start Time'][0], 
+                     Timestamp(test_results['Start Time'].iloc[0]))
+
+class Test_append_dataframe(unittest.TestCase):
+
+    @classmethod
+    def setUp(self):
+        index = pd.date_range('1/1/2017', periods=10, freq='H')
+        data = {'A': [0, 5, 5, 0, 5, 5, 5, 0, 0, 5], 
+                'B': [5, 0, 0, 0, 0, 0, 0, 0, 5, 5]}
+        self.df = pd.DataFrame(data, index=index)
+        
+    @classmethod
+    def tearDown(self):
+        pass
+    
+    def run_incremental(self, run_tests, split):
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.add_dataframe(self.df)
+        run_tests(pm)
+        expected = pm.test_results
+        
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.append_dataframe(self.df.iloc[0:split])
+        run_tests(pm)
+        pm.append_dataframe(self.df.iloc[split:])
+        run_tests(pm)
+        
+        key = ['Variable Name', 'Start Time']
+        assert_frame_equal(expected.sort_values(key).reset_index(drop=True), 
+                           pm.test_results.sort_values(key).reset_index(drop=True))
+        return pm
+    
+    def test_merge_range(self):
+        def run_tests(pm):
+            pm.check_range([None, 1])
+        self.run_incremental(run_tests, 5)
+        
+    def test_merge_increment(self):
+        def run_tests(pm):
+            pm.check_increment([None, 0], increment=2)
+        self.run_incremental(run_tests, 4)
+    
+    def test_merge_delta(self):
+        def run_tests(pm):
+            pm.check_delta([None, 4], window=2*3600)
+        self.run_incremental(run_tests, 6)
+    
+    def test_only_new_data_is_tested(self):
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.append_dataframe(self.df)
+        pm.check_range([None, 1])
+        assert_equal(pm.test_results.shape[0], 5)
+        
+        index = pd.date_range('1/1/2017 10:00', periods=2, freq='H')
+        pm.append_dataframe(pd.DataFrame({'A': [5, 0], 'B': [0, 0]}, index=index))
+        pm.check_range([None, 1])
+        assert_equal(pm.test_results.shape[0], 5)
+        assert_equal(pm.test_results['End Time'][2], index[0])
+        assert_equal(pm.test_results['Timesteps'][2], 2)
+
+class Test_add_column_store(unittest.TestCase):
+
+    @classmethod
+    def setUp(self):
+        np.random.seed(10)
+        index = pd.date_range('1/1/2017', periods=48, freq='H')
+        self.df = pd.DataFrame(np.random.randn(48, 5), index=index, 
+                               columns=['A', 'B', 'C', 'D', 'E'])
+        self.df.iloc[3:6, 1] = np.nan
+        self.df.iloc[10:12, 4] = -999
+        self.directory = tempfile.mkdtemp()
+        pecos.io.write_column_store(self.df, self.directory)
+        
+    @classmethod
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def run_tests(self, pm):
+        pm.add_translation_dictionary({'Key': ['B', 'C', 'E']})
+        pm.check_timestamp(3600)
+        pm.check_missing()
+        pm.check_corrupt([-999])
+        pm.check_range([-1.5, 1.5])
+        pm.check_increment([None, 2], 'Key')
+        pm.check_delta([None, 3], window=4*3600)
+        pm.check_outlier([None, 2], window=12*3600, rolling_mean=2*3600)
+    
+    def test_column_chunks(self):
+        pm = pecos.monitoring.PerformanceMonitoring()
+        pm.add_dataframe(self.df)
+        self.run_tests(pm)
+        
+        pm_store = pecos.monitoring.PerformanceMonitoring()
+        pm_store.add_column_store(self.directory, chunk_size=2)
+        assert_equal(pm_store.chunk_size, 2)
+        assert_equal(pm_store.df.index.freq, self.df.index.freq)
+        self.run_tests(pm_store)
+        
+        # Same test results, in a different order
+        key = ['Variable Name', 'Start Time', 'Error Flag']
+        assert_frame_equal(pm.test_results.sort_values(key).reset_index(drop=True),
+                           pm_store.test_results.sort_values(key).reset_index(drop=True))
+        assert_frame_equal(pm.df, pm_store.df)
+        assert_frame_equal(pm.get_test_results_mask(), 
+            pm_store.get_test_results_mask(intervals=True).to_dataframe())
+        
+        # Corrupt data is not replaced in the column store
+        df = pecos.io.read_column_store(self.directory)
+        assert_equal(df.iloc[10, 4], -999)
@@ -0,0 +1,117 @@
+from nose.tools import *
+from os.path import abspath, dirname, join, isfile, isdir
+from pandas.util.testing import assert_frame_equal
+import pecos
+import pandas as pd
+import numpy as np
+import shutil
+
+testdir = dirname(abspath(__file__))
+simpleexampledir = join(testdir,'..','..','examples','simple')
+
+def simple_config():
+    config = {'Specifications': {'Frequency': 900, 'Multiplier': 10, 'Max': 0.5},
+              'Translation': {'Wave': ['C','D']},
+              'Composite Signals': [
+                  {'Wave Model': "np.sin({Multiplier}*{ELAPSED_TIME}/86400)"},
+                  {'Wave Error': "np.abs(np.subtract({Wave}, {Wave Model}))"}],
+              'Time Filter': "({CLOCK_TIME} > 3*3600) & ({CLOCK_TIME} < 21*3600)",
+              'Corrupt Values': [-999],
+              'Range Bounds': {'A': {'Bound': [None, '{Max}'], 'Rolling Mean': 3600},
+                               'B': [0, 1],
+                               'Wave': [-1, 1],
+                               'Wave Error': [None, 0.25]},
+              'Increment Bounds': {'A': [0.0001, None],
+                                   'B': [0.0001, None],
+                                   'Wave': {'Bound': [0.0001, 0.6], 'Min Failures': 2}},
+              'Delta Bounds': {'Wave': {'Bound': [0.0001, None], 'Rolling Mean': 3600,
+                                        'Window': 7200}},
+              'Outlier Bounds': {'A': {'Bound': [None, 2], 'Rolling Mean': 3600,
+                                       'Window': 14400}}}
+    return config
+
+def test_compile_config():
+    config = simple_config()
+    plan = pecos.pipeline.compile_config(config)
+
+    assert_equal([step[0] for step in plan['setup']],
+                 ['check_timestamp', 'time_filter', 'check_missing',
+                  'check_corrupt', 'composite_signal', 'composite_signal'])
+    assert_equal(len(plan['checks']), 9)
+    # The rolling mean of A is used in the range and outlier tests
+    assert_equal(sorted(plan['rolling means']), [('A', 3600), ('Wave', 3600)])
+
+    config['Range Bounds']['B'] = {'Bound': [0, 1], 'Rolling Window': 3600}
+    assert_raises(ValueError, pecos.pipeline.compile_config, config)
+
+def test_run_pipeline():
+    config = simple_config()
+    df = pd.read_excel(join(simpleexampledir,'simple.xlsx'), index_col=0)
+    specs = config['Specifications']
+
+    # Serial analysis, same as simple_example_using_config.py
+    pm = pecos.monitoring.PerformanceMonitoring()
+    pm.add_dataframe(df)
+    pm.add_translation_dictionary(config['Translation'])
+    pm.check_timestamp(900)
+    time_filter = pm.evaluate_string('Time Filter', config['Time Filter'])
+    pm.add_time_filter(time_filter)
+    pm.check_missing()
+    pm.check_corrupt([-999])
+    for composite_signal in config['Composite Signals']:
+        for key, value in composite_signal.items():
+            signal = pm.evaluate_string(key, value, specs)
+            pm.add_dataframe(signal)
+            pm.add_translation_dictionary({key: list(signal.columns)})
+    pm.check_range([None, '{Max}'], 'A', specs, rolling_mean=3600)
+    pm.check_range([0, 1], 'B')
+    pm.check_range([-1, 1], 'Wave')
+    pm.check_range([None, 0.25], 'Wave Error')
+    pm.check_increment([0.0001, None], 'A')
+    pm.check_increment([0.0001, None], 'B')
+    pm.check_increment([0.0001, 0.6], 'Wave', min_failures=2)
+    pm.check_delta([0.0001, None], 'Wave', window=7200, rolling_mean=3600)
+    pm.check_outlier([None, 2], 'A', window=14400, rolling_mean=3600)
+
+    for threads in [1, 3]:
+        pm_pipeline = pecos.pipeline.run_pipeline(config, df, threads=threads)
+        assert_frame_equal(pm_pipeline.df, pm.df)
+        assert_frame_equal(pm_pipeline.test_results, pm.test_results)
+
+    # Bounds in the configuration are not modified
+    assert_equal(config['Range Bounds']['A']['Bound'], [None, '{Max}'])
+
+def test_pipeline_main():
+    results_directory = abspath(join(testdir, 'test_pipeline_main'))
+    if isdir(results_directory):
+        shutil.rmtree(results_directory)
+
+    pecos.pipeline.main([join(simpleexampledir, 'simple_config.yml'),
+                         join(simpleexampledir, 'simple.xlsx'),
+                         '--results-directory', results_directory,
+                         '--system-name', 'Simple', '--threads', '2'])
+
+    assert_true(isfile(join(results_directory, 'Simple.html')))
+    assert_true(isfile(join(results_directory, 'Simple_metrics.csv')))
+    test_results = pd.read_csv(join(results_directory, 'Simple_test_results.csv'),
+                               index_col=0)
+    expected = pd.read_csv(join(testdir, 'data', 'Simple_test_results.csv'), index_col=0)
+    assert_equal(test_results.shape[0], expected.shape[0])
+    
+    # Same as simple_example_using_config.py, Wave Model is not counted in 
+    # the QCI
+    metrics = pd.read_csv(join(results_directory, 'Simple_metrics.csv'), 
+                          index_col=0)
+    config = {'Specifications': {'Frequency': 900, 'Multiplier': 10},
+              'Composite Signals': [
+                  {'Wave Model': "np.sin({Multiplier}*{ELAPSED_TIME}/86400)"}], 
+              'Time Filter': "({CLOCK_TIME} > 3*3600) & ({CLOCK_TIME} < 21*3600)"}
+    df = pd.read_excel(join(simpleexampledir,'simple.xlsx'), index_col=0)
+    pm = pecos.pipeline.run_pipeline(config, df)
+    mask = pm.get_test_results_mask()
+    assert_equal(pecos.pipeline.qci(pm, config).iloc[0,0], 
+                 pecos.metrics.qci(mask, pm.tfilter).iloc[0,0])
+    config['QCI Exclude'] = ['Wave Model']
+    del mask['Wave Model']
+    assert_equal(pecos.pipeline.qci(pm, config).iloc[0,0], 
+                 pecos.metrics.qci(mask, pm.tfilter).iloc[0,0])
@@ -65,3 +65,30 @@ def test_round_index_invalid():
     new_index = pecos.utils.round_index(index, 15, 'invalid')
     diff = new_index.difference(index)
     assert_equals(len(diff), 0)
+
+def test_to_index_time():
+    index = pd.date_range('1/1/2016', periods=4, freq='H', tz='MST')
+    
+    # Times without a time zone are in the index time zone, times with a 
+    # time zone are converted to the index time zone
+    times = pd.Series([pd.Timestamp('1/1/2016 02:00', tz='UTC'), 
+                       '1/1/2016 02:00', None], dtype=object)
+    times = pecos.utils.to_index_time(times, index)
+    expected = pd.DatetimeIndex(['12/31/2015 19:00', '1/1/2016 02:00', 
+                                 None], tz='MST')
+    assert_true(times.equals(expected))
+    
+    times = pecos.utils.to_index_time(index.tz_convert('UTC'), index)
+    assert_true(times.equals(index))
+    
+    assert_raises(TypeError, pecos.utils.to_index_time, index, 
+                  index.tz_localize(None))
+
+def test_intervals_to_mask():
+    mask = pecos.utils.intervals_to_mask([0, 2, 1], [2, 4, 1], [0, 0, 1], 
+                                         (4, 2))
+    assert_equal(mask.tolist(), [[True, False], [True, False], 
+                                 [True, False], [True, False]])
+    
+    mask = pecos.utils.intervals_to_mask([1], [3], [1], (4, 2))
+    assert_equal(mask[:,1].tolist(), [False, True, True, False])
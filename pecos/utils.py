@@ -47,6 +47,84 @@ def round_index(dt, frequency, how='nearest'):
 
     return rounded_dt
 
+def to_index_time(times, index):
+    """
+    Convert times (Timestamps or strings) to a DatetimeIndex that can be 
+    compared to index.  Times without a time zone are assumed to be in the 
+    index time zone, times with a time zone are converted to the index 
+    time zone.  Object arrays can mix times with and without a time zone, 
+    so each value is converted separately.
+    
+    Parameters
+    ----------
+    times : pandas Series, DatetimeIndex, numpy ndarray or list
+        Times, for example the start times of test results
+    
+    index : DatetimeIndex
+        Time series index
+    
+    Returns
+    -------
+    DatetimeIndex in the time zone of the index
+    """
+    if not isinstance(index, pd.DatetimeIndex):
+        raise TypeError("index must be a DatetimeIndex")
+    
+    if getattr(times, 'dtype', None) == object:
+        times = [pd.Timestamp(t) for t in times]
+        if index.tz is not None:
+            times = [t if t is pd.NaT 
+                     else t.tz_localize(index.tz) if t.tz is None 
+                     else t.tz_convert(index.tz) for t in times]
+        times = pd.DatetimeIndex(times)
+    else:
+        times = pd.DatetimeIndex(times)
+    
+    if index.tz is not None:
+        if times.tz is None:
+            times = times.tz_localize(index.tz)
+        else:
+            times = times.tz_convert(index.tz)
+    elif times.tz is not None:
+        raise TypeError("Cannot compare tz-naive and tz-aware times")
+    
+    return times
+
+def intervals_to_mask(start, stop, col, shape):
+    """
+    Convert intervals to a boolean mask, True within [start, stop) of 
+    the column col.  All intervals are scattered into a difference array, 
+    which is then integrated using a cumulative sum.
+    
+    Parameters
+    ----------
+    start : numpy ndarray
+        Start position of each interval (inclusive)
+    
+    stop : numpy ndarray
+        Stop position of each interval (exclusive)
+    
+    col : numpy ndarray
+        Column of each interval
+    
+    shape : tuple
+        Shape of the mask
+    
+    Returns
+    -------
+    numpy ndarray with boolean values
+    """
+    start = np.asarray(start, dtype=int)
+    stop = np.asarray(stop, dtype=int)
+    col = np.asarray(col, dtype=int)
+    keep = stop > start
+    
+    counts = np.zeros((shape[0]+1, shape[1]), dtype=int)
+    np.add.at(counts, (start[keep], col[keep]), 1)
+    np.add.at(counts, (stop[keep], col[keep]), -1)
+    
+    return np.cumsum(counts[:-1], axis=0) > 0
+
 def convert_html_to_image(html_filename, image_filename, image_format='png', quality=100, zoom=1):
     """
     Convert html file to image file using wkhtmltoimage.
@@ -19,6 +19,7 @@ setuptools_kwargs = {
                          'matplotlib',
                          'jinja2'],
     'scripts': [],
+    'entry_points': {'console_scripts': ['pecos-pipeline = pecos.pipeline:main']},
     'include_package_data': True
 }
 